@@ -0,0 +1,471 @@
+# benchmarks.py
+# 사용법: python benchmarks.py [벤치마크 이름 ...]
+import json
+import os
+import random
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+@contextmanager
+def fake_openai_server(latency=0.5, throttle_rate=0.0, error_rate=0.0, disconnect_rate=0.0):
+    """응답마다 latency초 지연되는 로컬 OpenAI 호환 chat.completions 서버. base_url을 돌려준다.
+
+    응답 내용은 마지막 user 메시지를 그대로 돌려주므로 결과 순서를 확인할 수 있다.
+    stream=True 요청에는 SSE 조각으로 나누어 보낸다. throttle_rate 비율의 요청은 429(Retry-After 포함),
+    error_rate 비율의 요청은 503으로 거절한다. disconnect_rate 비율의 스트리밍 응답은 절반만 보낸 뒤 연결을 끊는다.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            roll = random.random()
+            if roll < throttle_rate:
+                self.send_error_response(429, 'rate_limit_exceeded', {'Retry-After': '0.2'})
+                return
+            if roll < throttle_rate + error_rate:
+                self.send_error_response(503, 'server_error')
+                return
+            time.sleep(latency)
+            content = body['messages'][-1]['content']
+            if body.get('stream'):
+                self.send_stream(body, content, disconnect=random.random() < disconnect_rate)
+                return
+            payload = json.dumps({
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': len(content), 'completion_tokens': len(content),
+                          'total_tokens': 2 * len(content)},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def send_error_response(self, status, code, headers=None):
+            payload = json.dumps({'error': {'message': code, 'type': code, 'code': code}}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def send_stream(self, body, content, disconnect=False):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            if disconnect:
+                # 본문 길이를 크게 알려 두고 중간에 끊어, 클라이언트가 불완전한 응답(RemoteProtocolError)을 받게 한다
+                self.send_header('Content-Length', str(1 << 20))
+            self.end_headers()
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+            for i, piece in enumerate(pieces):
+                if disconnect and i == len(pieces) // 2:
+                    self.close_connection = True
+                    return
+                event = {
+                    'id': 'chatcmpl-fake',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'delta': {'content': piece},
+                                 'finish_reason': 'stop' if i == len(pieces) - 1 else None}],
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/v1"
+    finally:
+        server.shutdown()
+
+
+def bench_load():
+    """엑셀 직접 파싱(cold)과 스냅샷 메모리 맵 로드(warm) 시간을 비교한다."""
+    import pandas as pd
+    from data_loader import load_snapshot, snapshot_path
+
+    for file_path in ['data_240802_1846.xlsx', 'uni_info_summary_240802.xlsx']:
+        snapshot_dir = tempfile.mkdtemp(prefix='snapshot-bench-')
+        try:
+            excel_time, _ = timed(pd.read_excel, file_path)
+            cold_time, _ = timed(load_snapshot, file_path, snapshot_dir)
+            # 첫 로드가 스냅샷을 남기지 못했다면 warm 측정은 엑셀을 다시 읽는 것이므로 여기서 멈춘다
+            if not os.path.exists(snapshot_path(file_path, snapshot_dir)):
+                raise RuntimeError(f"{file_path}: 첫 로드 뒤에 스냅샷이 만들어지지 않았습니다.")
+            warm_time, df = timed(load_snapshot, file_path, snapshot_dir, repeat=5)
+        finally:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+        print(f"{file_path} ({len(df)}행)")
+        print(f"  read_excel        : {excel_time * 1000:9.1f} ms")
+        print(f"  cold (스냅샷 생성): {cold_time * 1000:9.1f} ms")
+        print(f"  warm (스냅샷 로드): {warm_time * 1000:9.1f} ms")
+
+
+def bench_entry_score():
+    """행 단위 apply로 입결을 고르던 방식과 벡터화된 resolve_entry_score를 비교한다."""
+    import pandas as pd
+    from data_loader import load_data, resolve_entry_score
+
+    df = load_data('data_240802_1846.xlsx')
+
+    def get_entry_score(row):
+        entry_score_70 = row['2024년_입결70%']
+        entry_score_50 = row['2024년_입결50%']
+
+        if pd.isna(entry_score_70) or entry_score_70 in [0, -9999]:
+            if pd.isna(entry_score_50) or entry_score_50 in [0, -9999]:
+                return None
+            return entry_score_50
+        return entry_score_70
+
+    apply_time, expected = timed(df.apply, get_entry_score, axis=1, repeat=3)
+    vector_time, resolved = timed(resolve_entry_score, df, repeat=3)
+    pd.testing.assert_series_equal(resolved, expected.astype(float), check_names=False)
+    print(f"apply (행 단위)   : {apply_time * 1000:9.2f} ms")
+    print(f"vectorized        : {vector_time * 1000:9.2f} ms")
+    print(f"speedup           : {apply_time / vector_time:9.1f}x")
+
+
+def bench_llm_concurrency():
+    """가짜 OpenAI 서버(요청당 0.5초)로 보고서 한 건 분량(8회) GPT 호출의 직렬/동시 실행 시간을 비교한다."""
+    from concurrent.futures import ThreadPoolExecutor
+    from llm_client import configure_llm_client
+    from tabs import report_generation
+
+    prompts = [f"prompt {i}" for i in range(8)]
+    with fake_openai_server(latency=0.5) as base_url:
+        configure_llm_client(api_key='test', base_url=base_url)
+        report_generation.LLM_CACHE_ENABLED = False
+
+        def run_serial():
+            return [report_generation.generate_gpt_response(prompt) for prompt in prompts]
+
+        def run_concurrent():
+            with ThreadPoolExecutor(max_workers=report_generation.LLM_MAX_CONCURRENCY) as executor:
+                streams = report_generation.start_gpt_streams(executor, prompts)
+                return [stream.result() for stream in streams]
+
+        serial_time, serial = timed(run_serial)
+        concurrent_time, concurrent = timed(run_concurrent)
+    assert serial == concurrent == prompts, "응답 순서가 요청 순서와 다릅니다"
+    print(f"serial            : {serial_time:9.2f} s")
+    print(f"concurrent ({report_generation.LLM_MAX_CONCURRENCY})    : {concurrent_time:9.2f} s")
+
+
+def bench_llm_cache():
+    """가짜 OpenAI 서버(요청당 0.5초)에서 같은 프롬프트를 캐시 없이(cold) 한 번, 캐시에서(warm) 한 번 받는다."""
+    import llm_cache
+    from llm_client import configure_llm_client
+    from tabs import report_generation
+
+    prompts = [f"prompt {i}" for i in range(8)]
+    cache_dir = tempfile.mkdtemp(prefix='llm-cache-bench-')
+    try:
+        llm_cache._llm_cache = llm_cache.LLMCache(path=f"{cache_dir}/llm_cache.sqlite3",
+                                                  namespace=llm_cache.get_llm_cache().namespace)
+        with fake_openai_server(latency=0.5) as base_url:
+            configure_llm_client(api_key='test', base_url=base_url)
+            report_generation.LLM_CACHE_ENABLED = True
+            cold_time, cold = timed(lambda: [report_generation.generate_gpt_response(p) for p in prompts])
+            warm_time, warm = timed(lambda: [report_generation.generate_gpt_response(p) for p in prompts])
+        assert cold == warm == prompts, "캐시된 응답이 원래 응답과 다릅니다"
+        stats = llm_cache._llm_cache.stats()
+    finally:
+        llm_cache._llm_cache = None
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"cold (API 호출)   : {cold_time:9.2f} s")
+    print(f"warm (캐시)       : {warm_time * 1000:9.2f} ms")
+    print(f"hit rate          : {stats['hit_rate']:9.0%}")
+
+
+def bench_llm_retry():
+    """요청의 30%를 429, 10%를 503으로 거절하는 가짜 서버에 보고서 한 건 분량(8회)을 동시에 보내 모두 성공하는지 본다."""
+    from concurrent.futures import ThreadPoolExecutor
+    from llm_client import configure_llm_client
+    from tabs import report_generation
+
+    prompts = [f"prompt {i}" for i in range(8)]
+    with fake_openai_server(latency=0.2, throttle_rate=0.3, error_rate=0.1) as base_url:
+        client = configure_llm_client(api_key='test', base_url=base_url, rpm=120, tpm=100000)
+        report_generation.LLM_CACHE_ENABLED = False
+        with ThreadPoolExecutor(max_workers=report_generation.LLM_MAX_CONCURRENCY) as executor:
+            elapsed, results = timed(lambda: list(executor.map(report_generation.generate_gpt_response, prompts)))
+    assert results == prompts, "재시도 후 응답이 요청과 다릅니다"
+    stats = client.stats()
+    print(f"elapsed           : {elapsed:9.2f} s")
+    print(f"calls / retries   : {stats['calls']:5d} / {stats['retries']}")
+    print(f"latency mean/p95  : {stats['mean_latency']:9.2f} / {stats['p95_latency']:.2f} s")
+    print(f"throttle wait     : {stats['throttle_wait']:9.2f} s")
+
+
+def bench_llm_stream_failure():
+    """스트리밍 응답이 도중에 끊기는 가짜 서버로 GPTStream이 실패를 안내 문구로 바꾸고 캐시에 남기지 않는지 본다."""
+    from concurrent.futures import ThreadPoolExecutor
+    import llm_cache
+    from llm_client import configure_llm_client
+    from tabs import report_generation
+
+    prompts = [f"mid-stream disconnect prompt {i}" for i in range(4)]
+    cache_dir = tempfile.mkdtemp(prefix='llm-stream-bench-')
+    try:
+        llm_cache._llm_cache = llm_cache.LLMCache(path=f"{cache_dir}/llm_cache.sqlite3",
+                                                  namespace=llm_cache.get_llm_cache().namespace)
+        with fake_openai_server(latency=0.1, disconnect_rate=1.0) as base_url:
+            configure_llm_client(api_key='test', base_url=base_url)
+            report_generation.LLM_CACHE_ENABLED = True
+            with ThreadPoolExecutor(max_workers=report_generation.LLM_MAX_CONCURRENCY) as executor:
+                streams = report_generation.start_gpt_streams(executor, prompts, timeout=5)
+                elapsed, results = timed(lambda: [stream.result() for stream in streams])
+        assert results == [report_generation.LLM_FAILURE_MESSAGE] * len(prompts), "끊긴 응답이 성공으로 처리되었습니다"
+        assert all(llm_cache._llm_cache.get(report_generation.gpt_cache_key(p)) is None for p in prompts), \
+            "끊긴 응답이 캐시에 저장되었습니다"
+    finally:
+        llm_cache._llm_cache = None
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"elapsed           : {elapsed:9.2f} s")
+    print(f"errors            : {sorted({stream.error.split(':')[0] for stream in streams})}")
+
+
+def bench_chart_payload():
+    """보고서 한 건 분량(6개 학과 x 차트 3개)의 차트를 출력 모드별로 그려 렌더링 시간과 전송 바이트를 비교한다.
+
+    legacy는 예전 방식(300dpi PNG를 base64 data URI로 마크다운에 넣음)이고, PNG 모드는 st.image로 보내는 원본 바이트,
+    svg는 페이지에 그대로 넣는 인라인 마크업 길이다.
+    """
+    import base64
+    from charts import CHART_OUTPUT_MODES, TREND_CHARTS, init_chart_worker, render_chart, trend_chart_spec
+    from data_loader import get_data
+    from tabs.report_generation import inline_svg_markup
+
+    init_chart_worker()
+    rows = [row for _, row in get_data().head(6).iterrows()]
+    specs = [trend_chart_spec(row, metric) for row in rows for metric in TREND_CHARTS]
+    modes = [('legacy', CHART_OUTPUT_MODES['print'])] + list(CHART_OUTPUT_MODES.items())
+    for mode, (dpi, image_format) in modes:
+        render_time, images = timed(lambda: [render_chart(spec, dpi, image_format) for spec in specs])
+        if mode == 'legacy':
+            payload = sum(len(f"![chart](data:image/png;base64,{base64.b64encode(image).decode()})")
+                          for image in images)
+        elif image_format == 'svg':
+            payload = sum(len(inline_svg_markup(image, 'chart').encode('utf-8')) for image in images)
+        else:
+            payload = sum(len(image) for image in images)
+        print(f"{mode:8s} ({image_format}, {dpi:3d}dpi): {render_time:7.2f} s, {payload / 1024:9.1f} KB")
+
+
+def loaded_modules(names):
+    """이 프로세스에 올라와 있는 모듈 이름. 차트 워커에서 실행해 main.py가 다시 실행되었는지 본다."""
+    return sorted(name for name in names if name in sys.modules)
+
+
+# Streamlit처럼 main.py를 __main__으로 등록한 프로세스에서 차트 하나를 워커로 그린다
+CHART_WORKER_MAIN_SCRIPT = """
+import json, os, sys, types
+
+main = types.ModuleType('__main__')
+main.__file__ = os.path.abspath('main.py')
+sys.modules['__main__'] = main
+
+import benchmarks, charts
+from data_loader import get_data
+
+spec = charts.trend_chart_spec(get_data().iloc[0], '경쟁률')
+image = charts.submit_chart(spec, 72, 'svg').result(timeout=120)
+pool = charts.get_chart_pool()
+leaked = pool.submit(benchmarks.loaded_modules, ['dotenv', 'yaml', 'streamlit_authenticator', 'prewarm']).result()
+print(json.dumps({'image_bytes': len(image), 'leaked': leaked}))
+"""
+
+
+def bench_chart_worker_main():
+    """__main__이 main.py인 프로세스(Streamlit 서버와 같은 상태)에서 차트 워커가 main.py를 다시 실행하지 않는지 본다.
+
+    워커가 main.py를 실행하면 .env/config.yaml/인증기를 읽고 pre-warm을 다시 시작하므로, 그런 흔적이 있으면 False를 반환한다.
+    """
+    import subprocess
+
+    cache_dir = tempfile.mkdtemp(prefix='chart-worker-bench-')
+    try:
+        env = {**os.environ, 'CHART_CACHE_DIR': cache_dir, 'CHART_WORKERS': '2'}
+        elapsed, completed = timed(lambda: subprocess.run([sys.executable, '-c', CHART_WORKER_MAIN_SCRIPT], env=env,
+                                                          capture_output=True, text=True, timeout=300))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    if completed.returncode != 0:
+        print(completed.stderr)
+        return False
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(f"elapsed           : {elapsed:9.2f} s")
+    print(f"image bytes       : {result['image_bytes']:9d}")
+    print(f"worker leaked     : {result['leaked']}")
+    return result['image_bytes'] > 0 and not result['leaked']
+
+
+def bench_university_checklist():
+    """대학 320곳 x 3개 리스트의 대학 체크리스트를 AppTest로 한 번 실행하는 시간과 위젯 수를 비교한다.
+
+    legacy는 예전 방식(대학마다 st.checkbox), new는 ui_components.display_university_checklist다.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def legacy_app():
+        import streamlit as st
+        universities = [f"대학{i:03d}" for i in range(320)]
+        for title in ['상향 리스트', '적정 리스트', '하향 리스트']:
+            st.subheader(title)
+            cols = st.columns(3)
+            for i, univ in enumerate(universities):
+                with cols[i % 3]:
+                    st.checkbox(univ, key=f"subject_{title}_{univ}_{i}")
+
+    def new_app():
+        import pandas as pd
+        from ui_components import display_university_checklist
+        df = pd.DataFrame({'대학명': [f"대학{i:03d}" for i in range(320)]})
+        for title in ['상향 리스트', '적정 리스트', '하향 리스트']:
+            display_university_checklist(df, title, prefix="subject_")
+
+    for name, app in [('legacy', legacy_app), ('new', new_app)]:
+        at = AppTest.from_function(app, default_timeout=60)
+        first_run, _ = timed(at.run)
+        rerun, _ = timed(at.run, repeat=5)
+        widgets = len(at.checkbox) + len(at.multiselect) + len(at.selectbox) + len(at.button)
+        print(f"{name:6s}: first run {first_run * 1000:8.1f} ms, rerun {rerun * 1000:8.1f} ms, {widgets:4d} widgets")
+
+
+# 로그인 화면이 뜨기 전(main.py 상단)에 허용하는 import 시간. streamlit 자체는 서버 프로세스가 이미 불러 두므로 빼고 센다
+IMPORT_TIME_BUDGET_MS = 400
+IMPORT_TIME_PRELOAD = "import streamlit"
+IMPORT_TIME_TARGETS = [
+    ('login', "import dotenv, yaml, streamlit_authenticator, prewarm"),
+    ('info_input', "import tabs.info_input"),
+    ('filtering', "import tabs.subject_filtering, tabs.comprehensive_filtering"),
+    ('final_filtering', "import tabs.final_filtering"),
+    ('report_generation', "import tabs.report_generation"),
+    ('llm_client', "import llm_client; llm_client.get_llm_client()"),
+    ('chart_worker', "import charts; charts.init_chart_worker()"),
+]
+IMPORT_TIME_REPORT_PATH = 'importtime_report.txt'
+
+
+def _importtime_entries(statement):
+    """python -X importtime -c statement의 (깊이, 누적 ms, 모듈) 목록. 깊이 0이 statement가 직접 불러온 모듈이다."""
+    import subprocess
+
+    env = dict(os.environ, API_KEY=os.getenv('API_KEY', 'sk-importtime'))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 모듈 이름 앞 공백은 1칸 + 깊이당 2칸이다
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, int(cumulative) / 1000, name.strip()))
+    return entries
+
+
+def importtime_report(statement, preload=IMPORT_TIME_PRELOAD):
+    """새 인터프리터에서 preload 뒤에 statement를 실행한 import 시간. (총 ms, [(누적 ms, 깊이, 모듈)] 무거운 순).
+
+    인터프리터 시작과 preload에서 불린 모듈은 빼고, statement가 직접 불러온 모듈(깊이 0)과
+    그 바로 아래 모듈(깊이 1)을 돌려준다. 총 시간은 깊이 0 모듈의 합이다.
+    """
+    baseline = {name for depth, _, name in _importtime_entries(preload or 'pass') if depth == 0}
+    entries = _importtime_entries(f"{preload}; {statement}" if preload else statement)
+    # -X importtime은 import가 끝난 순서로 출력하므로 깊이 1 모듈은 부모(깊이 0) 줄 바로 앞에 모여 있다
+    kept = []
+    pending = []
+    for depth, ms, name in entries:
+        if depth == 1:
+            pending.append((ms, depth, name))
+        elif depth == 0:
+            if name not in baseline:
+                kept.extend(pending)
+                kept.append((ms, depth, name))
+            pending = []
+    total = sum(ms for ms, depth, _ in kept if depth == 0)
+    return total, sorted(kept, reverse=True)
+
+
+def bench_import_time(top=8):
+    """화면/기능별 cold import 시간 보고서를 출력하고 IMPORT_TIME_REPORT_PATH에 저장한다.
+
+    login 항목이 IMPORT_TIME_BUDGET_MS를 넘으면 False를 반환해 벤치마크 실행이 0이 아닌 코드로 끝나게 한다.
+    """
+    import platform
+
+    lines = [f"# python -X importtime 요약 ({platform.python_version()}, {time.strftime('%Y-%m-%d')}, "
+             f"'{IMPORT_TIME_PRELOAD}' 이후, login 예산 {IMPORT_TIME_BUDGET_MS} ms)",
+             "# 다시 만들기: python benchmarks.py import_time"]
+    within_budget = True
+    for label, statement in IMPORT_TIME_TARGETS:
+        total, modules = importtime_report(statement)
+        over = ""
+        if label == 'login' and total > IMPORT_TIME_BUDGET_MS:
+            over = " (예산 초과)"
+            within_budget = False
+        lines.append(f"{label:18s}: {total:8.1f} ms{over}    [{statement}]")
+        for ms, depth, name in modules[:top]:
+            lines.append(f"    {ms:8.1f} ms  {'  ' * depth}{name}")
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    with open(IMPORT_TIME_REPORT_PATH, 'w', encoding='utf-8') as file:
+        file.write(report)
+    return within_budget
+
+
+BENCHMARKS = {
+    'load': bench_load,
+    'entry_score': bench_entry_score,
+    'llm_concurrency': bench_llm_concurrency,
+    'llm_cache': bench_llm_cache,
+    'llm_retry': bench_llm_retry,
+    'llm_stream_failure': bench_llm_stream_failure,
+    'chart_payload': bench_chart_payload,
+    'chart_worker_main': bench_chart_worker_main,
+    'university_checklist': bench_university_checklist,
+    'import_time': bench_import_time,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    failed = []
+    for name in names:
+        print(f"== {name} ==")
+        if BENCHMARKS[name]() is False:
+            failed.append(name)
+    if failed:
+        sys.exit(f"기준을 넘은 벤치마크: {', '.join(failed)}")
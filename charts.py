@@ -0,0 +1,377 @@
+# charts.py
+# 보고서 차트는 순수한 데이터(ChartSpec)로 기술하고, 별도 프로세스에서 이미지 바이트로 그린다.
+# pyplot 전역 상태를 쓰지 않고 Figure/FigureCanvasAgg를 직접 다루므로 세션이 동시에 그려도 서로 섞이지 않는다.
+import io
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import context, reduction, spawn, util
+
+from memo_cache import ByteLRUCache, canonical_hash
+
+CHART_FONT_PATH = 'KoPubDotumLight.ttf'
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', str(min(4, os.cpu_count() or 1))))
+CHART_DPI = 300
+# 출력 모드별 (DPI, 형식). 화면에는 screen이나 svg를 쓰고, 300dpi PNG는 인쇄용 내보내기에만 쓴다.
+# screen(PNG)은 미디어 파일로 전송되고, svg는 글자를 경로 대신 텍스트로 둔 마크업을 페이지에 그대로 넣는다
+CHART_OUTPUT_MODES = {
+    'screen': (100, 'png'),
+    'svg': (72, 'svg'),
+    'print': (CHART_DPI, 'png'),
+}
+CHART_OUTPUT_MODE = os.getenv('CHART_OUTPUT_MODE', 'screen')
+CHART_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+CHART_YEARS = ('2022년', '2023년', '2024년')
+# 그리는 방식(폰트, 스타일, render_chart 코드)이 바뀌면 올려서 이전 캐시를 무효로 만든다
+CHART_STYLE = 'whitegrid-pastel-KoPubDotumLight-v2'
+CHART_CACHE_DIR = os.getenv('CHART_CACHE_DIR', os.path.join('.cache', 'charts'))
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# 디스크 계층 한도. 넘으면 가장 오래 쓰지 않은 파일부터 지워 한도의 CHART_DISK_CACHE_TRIM_RATIO까지 줄인다
+CHART_DISK_CACHE_MAX_BYTES = int(os.getenv('CHART_DISK_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+CHART_DISK_CACHE_TRIM_RATIO = 0.9
+
+# kind: 'line'(연도별 추이), 'grouped_bar'(모집단위 vs 계열평균 막대), 'bar'(단일 막대)
+# series: (범례 이름, 값 튜플, 선 스타일) 튜플
+ChartPanel = namedtuple('ChartPanel', ['kind', 'title', 'ylabel', 'labels', 'series'])
+ChartSpec = namedtuple('ChartSpec', ['name', 'figsize', 'panels'])
+
+# 지표별 차트 구성. trend는 '{연도}_' 뒤에 붙는 모집단위/계열평균 열 이름, compare는 (모집단위 열, 계열평균 열),
+# change는 변동(%) 막대 열이며 None이면 그 패널을 그리지 않는다
+TREND_CHARTS = {
+    '경쟁률': {
+        'name': 'Competition Rate Analysis',
+        'figsize': (20, 5),
+        'trend': ('경쟁률', '계열경쟁률'),
+        'trend_title': '3개년 경쟁률 추이',
+        'ylabel': '경쟁률',
+        'compare_labels': ('2024년 경쟁률', '3개년 평균'),
+        'compare': (('2024년_경쟁률', '3개년_경쟁률_평균'), ('2024년_계열경쟁률', '3개년_계열경쟁률_평균')),
+        'compare_title': '2024년 vs 3개년 평균 경쟁률',
+        'change': ('2024년_경쟁률변동(%)', '2024년_계열경쟁률변동(%)'),
+        'change_title': '2024년 경쟁률 변동(%)',
+    },
+    '입결': {
+        'name': 'Entrance Score Analysis',
+        'figsize': (20, 5),
+        'trend': ('입결70%', '계열입결70%'),
+        'trend_title': '3개년 입결 70% 추이',
+        'ylabel': '입결 70%',
+        'compare_labels': ('2024년 입결 70%', '3개년 평균'),
+        'compare': (('2024년_입결70%', '3개년_입결70%_평균'), ('2024년_계열입결70%', '3개년_계열입결70%_평균')),
+        'compare_title': '2024년 vs 3개년 평균 입결 70%',
+        'change': ('2024년_입결70%변동(%)', '2024년_계열입결70%변동(%)'),
+        'change_title': '2024년 입결 70% 변동(%)',
+    },
+    '충원율': {
+        'name': 'Fill Rate Analysis',
+        'figsize': (15, 5),
+        'trend': ('충원율(%)', '계열충원율(%)'),
+        'trend_title': '3개년 충원율 추이',
+        'ylabel': '충원율 (%)',
+        'compare_labels': ('2024년 충원율', '3개년 평균'),
+        'compare': (('2024년_충원율(%)', '3개년_충원율_평균'), ('2024년_계열충원율(%)', '3개년_계열충원율_평균')),
+        'compare_title': '2024년 vs 3개년 평균 충원율',
+        'change': None,
+    },
+}
+
+
+def _values(row, columns):
+    values = []
+    for column in columns:
+        try:
+            values.append(float(row[column]))
+        except (TypeError, ValueError):
+            values.append(math.nan)
+    return tuple(values)
+
+
+def trend_chart_spec(row, metric):
+    """학과 한 행으로 지표(경쟁률/입결/충원율) 차트의 ChartSpec을 만든다. 학생 정보와는 무관하다."""
+    config = TREND_CHARTS[metric]
+    unit_column, series_column = config['trend']
+    panels = [
+        ChartPanel('line', config['trend_title'], config['ylabel'], CHART_YEARS, (
+            ('모집단위', _values(row, [f"{year}_{unit_column}" for year in CHART_YEARS]), '-'),
+            ('계열평균', _values(row, [f"{year}_{series_column}" for year in CHART_YEARS]), '--'),
+        )),
+        ChartPanel('grouped_bar', config['compare_title'], None, config['compare_labels'], (
+            ('모집단위', _values(row, config['compare'][0]), None),
+            ('계열평균', _values(row, config['compare'][1]), None),
+        )),
+    ]
+    if config['change'] is not None:
+        panels.append(ChartPanel('bar', config['change_title'], '변동률 (%)', ('모집단위', '계열평균'), (
+            (None, _values(row, config['change']), None),
+        )))
+    return ChartSpec(config['name'], config['figsize'], tuple(panels))
+
+
+_font_prop = None
+
+
+def init_chart_worker(font_path=CHART_FONT_PATH):
+    """워커 프로세스마다 한 번: 한글 폰트를 등록하고 whitegrid/pastel 스타일을 프로세스 기본값으로 둔다."""
+    global _font_prop
+    import matplotlib
+    import matplotlib.font_manager as fm
+    import seaborn as sns
+
+    matplotlib.use('Agg')
+    fm.fontManager.addfont(font_path)
+    _font_prop = fm.FontProperties(fname=font_path)
+    sns.set_theme(style="whitegrid", palette="pastel")
+    matplotlib.rcParams['font.family'] = _font_prop.get_name()
+    matplotlib.rcParams['font.size'] = 12
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    # SVG의 글자를 글리프 경로로 풀지 않고 텍스트로 둔다. 크기가 절반 이하로 줄고 글꼴은 브라우저가 고른다
+    matplotlib.rcParams['svg.fonttype'] = 'none'
+
+
+def render_chart(spec, dpi=CHART_DPI, image_format='png'):
+    """ChartSpec을 이미지 바이트로 그린다. 워커에서 init_chart_worker가 먼저 불려 있어야 한다."""
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if _font_prop is None:
+        init_chart_worker()
+    fig = Figure(figsize=spec.figsize)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, len(spec.panels))
+    for ax, panel in zip(axes, spec.panels):
+        if panel.kind == 'line':
+            for label, values, linestyle in panel.series:
+                ax.plot(panel.labels, values, marker='o', linestyle=linestyle, label=label)
+            ax.legend(prop=_font_prop)
+        elif panel.kind == 'grouped_bar':
+            x = np.arange(len(panel.labels))
+            width = 0.35
+            offsets = (-width / 2, width / 2)
+            for offset, (label, values, _) in zip(offsets, panel.series):
+                ax.bar(x + offset, values, width, label=label)
+            ax.set_xticks(x)
+            ax.set_xticklabels(panel.labels, fontproperties=_font_prop)
+            ax.legend(prop=_font_prop)
+        else:
+            ax.bar(panel.labels, panel.series[0][1])
+        ax.set_title(panel.title, fontproperties=_font_prop)
+        if panel.ylabel:
+            ax.set_ylabel(panel.ylabel, fontproperties=_font_prop)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    # SVG 메타데이터에 만든 시각은 넣지 않는다
+    metadata = {'Date': None} if image_format == 'svg' else None
+    fig.savefig(buffer, format=image_format, dpi=dpi, bbox_inches='tight', metadata=metadata)
+    return buffer.getvalue()
+
+
+if sys.platform != 'win32':
+    from multiprocessing import forkserver, popen_forkserver
+
+    class _ChartWorkerPopen(popen_forkserver.Popen):
+        """forkserver로 워커를 띄우되, 부모의 __main__ 정보는 넘기지 않는다.
+
+        Streamlit은 스크립트(main.py)를 __main__으로 등록하므로 그대로 넘기면 워커가 시작할 때마다 main.py를
+        __mp_main__으로 다시 실행한다(.env, config.yaml, 인증기, pre-warm). 워커에는 charts만 있으면 된다.
+        """
+
+        def _launch(self, process_obj):
+            prep_data = spawn.get_preparation_data(process_obj._name)
+            prep_data.pop('init_main_from_path', None)
+            prep_data.pop('init_main_from_name', None)
+            buf = io.BytesIO()
+            context.set_spawning_popen(self)
+            try:
+                reduction.dump(prep_data, buf)
+                reduction.dump(process_obj, buf)
+            finally:
+                context.set_spawning_popen(None)
+
+            self.sentinel, w = forkserver.connect_to_new_process(self._fds)
+            _parent_w = os.dup(w)
+            self.finalizer = util.Finalize(self, util.close_fds, (_parent_w, self.sentinel))
+            with open(w, 'wb', closefd=True) as f:
+                f.write(buf.getbuffer())
+            self.pid = forkserver.read_signed(self.sentinel)
+
+
+    class _ChartWorkerProcess(context.ForkServerProcess):
+        @staticmethod
+        def _Popen(process_obj):
+            return _ChartWorkerPopen(process_obj)
+
+
+    class _ChartWorkerContext(context.ForkServerContext):
+        Process = _ChartWorkerProcess
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_chart_pool():
+    """프로세스 공용 차트 렌더링 풀.
+
+    Streamlit 서버가 스레드를 쓰므로 fork는 쓰지 않는다. charts를 미리 올려 둔 forkserver에서 워커를 갈라내고,
+    워커는 Streamlit 스크립트(__main__)를 import하지 않는다. forkserver가 없는 플랫폼(Windows)은 spawn을 쓴다.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if sys.platform != 'win32':
+                forkserver.set_forkserver_preload(['charts'])
+                mp_context = _ChartWorkerContext()
+            else:
+                mp_context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=mp_context,
+                                        initializer=init_chart_worker)
+        return _pool
+
+
+# 메모리 계층. 디스크 계층은 CHART_CACHE_DIR 아래 '<키>.<형식>' 파일이다
+chart_cache = ByteLRUCache(CHART_CACHE_MAX_BYTES)
+
+
+def chart_cache_key(spec, dpi=CHART_DPI, image_format='png'):
+    """그려지는 값, 차트 구성, 스타일, DPI, 형식의 해시. 학생 정보는 들어가지 않는다."""
+    return canonical_hash({'spec': spec, 'style': CHART_STYLE, 'dpi': dpi, 'format': image_format})
+
+
+def chart_cache_path(key, image_format):
+    return os.path.join(CHART_CACHE_DIR, f"{key}.{image_format}")
+
+
+def load_cached_chart(key, image_format):
+    image = chart_cache.get(key)
+    if image is not None:
+        return image
+    try:
+        with open(chart_cache_path(key, image_format), 'rb') as file:
+            image = file.read()
+    except FileNotFoundError:
+        return None
+    # 디스크 계층은 mtime 순으로 지우므로 읽을 때도 갱신해 최근에 쓴 차트가 남게 한다
+    try:
+        os.utime(chart_cache_path(key, image_format))
+    except OSError:
+        pass
+    chart_cache.put(key, image)
+    return image
+
+
+def trim_disk_cache(max_bytes=CHART_DISK_CACHE_MAX_BYTES):
+    """디스크 계층이 max_bytes를 넘으면 mtime이 오래된 파일부터 지운다. 남은 바이트 수를 반환한다."""
+    entries = []
+    try:
+        with os.scandir(CHART_CACHE_DIR) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+    target = max_bytes * CHART_DISK_CACHE_TRIM_RATIO
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+# 디스크 계층의 현재 바이트 수. 처음 저장할 때 한 번 훑고, 이후에는 쓴 만큼 더하다가 한도를 넘으면 다시 훑는다
+_disk_cache_bytes = None
+_disk_cache_lock = threading.Lock()
+
+
+def store_chart(key, image_format, image):
+    global _disk_cache_bytes
+    chart_cache.put(key, image)
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    path = chart_cache_path(key, image_format)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(image)
+    os.replace(temp_path, path)
+    with _disk_cache_lock:
+        if _disk_cache_bytes is None:
+            _disk_cache_bytes = trim_disk_cache()
+        else:
+            _disk_cache_bytes += len(image)
+            if _disk_cache_bytes > CHART_DISK_CACHE_MAX_BYTES:
+                _disk_cache_bytes = trim_disk_cache()
+
+
+def submit_chart(spec, dpi=CHART_DPI, image_format='png'):
+    """ChartSpec의 이미지 바이트 Future를 반환한다.
+
+    메모리나 디스크 캐시에 있으면 완료된 Future를 바로 돌려주고, 없으면 풀에서 그린 뒤 두 계층에 저장한다.
+    """
+    key = chart_cache_key(spec, dpi, image_format)
+    image = load_cached_chart(key, image_format)
+    if image is not None:
+        future = Future()
+        future.set_result(image)
+        return future
+
+    future = get_chart_pool().submit(render_chart, spec, dpi, image_format)
+
+    def store(done):
+        if done.exception() is None:
+            store_chart(key, image_format, done.result())
+
+    future.add_done_callback(store)
+    return future
+
+
+def prewarm_chart_cache(mode=CHART_OUTPUT_MODE):
+    """전체 모집단위 행의 mode(CHART_OUTPUT_MODES) 차트를 미리 그려 디스크 캐시에 채운다. 이미 있는 차트는 건너뛴다.
+
+    기본값은 화면 보고서가 읽는 CHART_OUTPUT_MODE다. 디스크 계층은 CHART_DISK_CACHE_MAX_BYTES를 넘지 않으므로,
+    전체를 남기려면 한도를 모드별 전체 크기(screen 기준 약 1.3GB)보다 크게 잡는다.
+    """
+    from data_loader import get_data
+
+    dpi, image_format = CHART_OUTPUT_MODES[mode]
+    data = get_data()
+    pending = set()
+    cached = 0
+    for _, row in data.iterrows():
+        for metric in TREND_CHARTS:
+            spec = trend_chart_spec(row, metric)
+            if os.path.exists(chart_cache_path(chart_cache_key(spec, dpi, image_format), image_format)):
+                cached += 1
+                continue
+            pending.add(submit_chart(spec, dpi, image_format))
+            # 메모리에 결과를 너무 많이 쌓지 않도록 워커 수의 몇 배만큼만 앞서 넣는다
+            if len(pending) >= CHART_WORKERS * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+    for future in pending:
+        future.result()
+    total = len(data) * len(TREND_CHARTS)
+    print(f"[{mode}] {total}개 차트 중 {cached}개는 이미 캐시에 있었고 {total - cached}개를 새로 그렸습니다.")
+
+
+if __name__ == "__main__":
+    # 사용법: python charts.py prewarm [모드 ...]  (모드: screen, svg, print. 기본값 CHART_OUTPUT_MODE)
+    usage = f"사용법: python charts.py prewarm [{' | '.join(CHART_OUTPUT_MODES)} ...]"
+    if len(sys.argv) < 2 or sys.argv[1] != 'prewarm' or not set(sys.argv[2:]) <= set(CHART_OUTPUT_MODES):
+        sys.exit(usage)
+    # 워커는 __main__을 import하지 않으므로, 워커에 넘기는 함수와 ChartSpec이 charts 모듈 것이 되도록 다시 import한다
+    import charts
+
+    for mode in sys.argv[2:] or [CHART_OUTPUT_MODE]:
+        charts.prewarm_chart_cache(mode)
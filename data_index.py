@@ -0,0 +1,135 @@
+# data_index.py
+import numpy as np
+
+from category_mapping import DETAIL_TO_MID_CATEGORY
+
+PARTITION_COLUMNS = ('전형구분', '계열', '계열구분')
+SCHOOL_TYPE_FLAG_COLUMNS = ('과학고', '전사고', '외고')
+WOMENS_UNIVERSITY_KEYWORD = '여자'
+
+
+def intersect_rows(*row_sets):
+    """정렬된 행 위치 배열들의 교집합. 작은 집합부터 교차해 비용을 줄인다."""
+    row_sets = sorted(row_sets, key=len)
+    rows = row_sets[0]
+    for other in row_sets[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+
+def union_rows(*row_sets):
+    if not row_sets:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(row_sets))
+
+
+def rows_to_mask(rows, size):
+    mask = np.zeros(size, dtype=bool)
+    mask[rows] = True
+    return mask
+
+
+class TermIndex:
+    """계열상세명에 검색어가 포함된 행 위치 목록 (대소문자 무시).
+
+    소계열 키워드는 미리 만들어 두고, 처음 보는 검색어는 한 번 훑은 뒤 기억한다.
+    """
+
+    def __init__(self, df, terms=()):
+        self._values = df['계열상세명'].astype(str).str.lower()
+        self._postings = {}
+        for term in terms:
+            self.rows(term)
+
+    def rows(self, term):
+        term = term.lower()
+        rows = self._postings.get(term)
+        if rows is None:
+            rows = np.flatnonzero(self._values.str.contains(term, regex=False).to_numpy())
+            self._postings[term] = rows
+        return rows
+
+    def rows_any(self, terms):
+        return union_rows(*[self.rows(term) for term in terms])
+
+
+class ScoreIndex:
+    """(전형구분, 계열) 파티션별로 입결 오름차순 정렬한 행 위치.
+
+    입결 구간 조회는 파티션마다 searchsorted 두 번으로 연속 구간을 잘라낸다.
+    """
+
+    def __init__(self, df, scores):
+        self.partitions = {}
+        for key, rows in df.groupby(['전형구분', '계열'], sort=False).indices.items():
+            rows = rows[~np.isnan(scores[rows])]
+            order = np.argsort(scores[rows], kind='stable')
+            self.partitions[key] = (scores[rows][order], rows[order])
+
+    def range_rows(self, lower, upper, upper_inclusive=False, categories=None, fields=None):
+        """lower <= 입결 < upper (upper_inclusive이면 <=) 인 행 위치를 원래 순서대로 반환한다."""
+        slices = []
+        for (category, field), (sorted_scores, rows) in self.partitions.items():
+            if categories is not None and category not in categories:
+                continue
+            if fields is not None and field not in fields:
+                continue
+            start = np.searchsorted(sorted_scores, lower, side='left')
+            stop = np.searchsorted(sorted_scores, upper, side='right' if upper_inclusive else 'left')
+            if start < stop:
+                slices.append(rows[start:stop])
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(slices))
+
+
+class PartitionIndex:
+    """전형구분/계열/계열구분 값과 고교 유형 지원 가능 여부별 행 위치를 미리 계산한 인덱스.
+
+    입결 정렬 인덱스(score_index)와 계열상세명 검색어 인덱스(term_index)도 함께 가진다.
+
+    데이터가 바뀌지 않는 동안 한 번만 만들고, 후보 행은 집합 연산으로 구한다.
+    terms는 미리 훑어 둘 계열상세명 검색어이며, 빈 값이면 검색어마다 처음 쓰일 때 훑는다.
+    """
+
+    def __init__(self, df, score_column, terms=DETAIL_TO_MID_CATEGORY):
+        self.size = len(df)
+        self.all_rows = np.arange(self.size)
+        self.postings = {
+            column: {value: np.sort(rows) for value, rows in df.groupby(column, sort=False).indices.items()}
+            for column in PARTITION_COLUMNS
+        }
+        self.flag_masks = {column: df[column].to_numpy() == 1 for column in SCHOOL_TYPE_FLAG_COLUMNS}
+        self.flags = {column: np.flatnonzero(mask) for column, mask in self.flag_masks.items()}
+        self.womens_university_mask = df['대학명'].str.contains(WOMENS_UNIVERSITY_KEYWORD, na=False).to_numpy()
+        self.womens_university = np.flatnonzero(self.womens_university_mask)
+        self.non_womens_university = np.flatnonzero(~self.womens_university_mask)
+
+        self.scores = df[score_column].to_numpy(dtype=float)
+        self.score_index = ScoreIndex(df, self.scores)
+        self.term_index = TermIndex(df, terms)
+        self.lowest_ability_codes = df['2025년_수능최저코드'].to_numpy(dtype=float)
+        self.max_lowest_ability_code = np.nanmax(self.lowest_ability_codes)
+
+    def rows(self, column, values):
+        postings = self.postings[column]
+        return union_rows(*[postings[value] for value in values if value in postings])
+
+    def eligible_rows(self, category, fields, gender, school_type):
+        row_sets = [self.rows('전형구분', [category]), self.rows('계열', fields)]
+        if gender == '남자':
+            row_sets.append(self.non_womens_university)
+        if school_type in self.flags:
+            row_sets.append(self.flags[school_type])
+        return intersect_rows(*row_sets)
+
+    def filter_rows(self, rows, gender, school_type, lowest_ability_limit):
+        """행 위치 배열에서 성별/고교 유형/수능최저 조건을 만족하는 행만 남긴다. 비용은 len(rows)에 비례한다."""
+        keep = self.lowest_ability_codes[rows] <= lowest_ability_limit
+        if gender == '남자':
+            keep &= ~self.womens_university_mask[rows]
+        if school_type in self.flag_masks:
+            keep &= self.flag_masks[school_type][rows]
+        return rows[keep]
@@ -1,28 +1,256 @@
-### data_loader.py ###
 # data_loader.py
-import streamlit as st
 import pandas as pd
+import numpy as np
+import hashlib
 import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow가 없으면 스냅샷 없이 엑셀을 직접 읽는다
+    pa = None
+    feather = None
+
+# 엑셀 원본을 변환해 둔 컬럼형(Arrow IPC) 스냅샷 저장 위치
+SNAPSHOT_DIR = '.snapshot'
+SNAPSHOT_MANIFEST = 'manifest.json'
+
+logger = logging.getLogger(__name__)
+# 숫자 열에 섞여 들어온 결측 표기 문자열
+MISSING_VALUE_STRINGS = {'None', 'nan', 'NaN', '-', ''}
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def snapshot_key(file_path, snapshot_dir=SNAPSHOT_DIR):
+    """원본 파일의 (sha256, mtime) 기준 스냅샷 정보를 반환한다.
+
+    mtime과 크기가 manifest와 같으면 해시를 다시 계산하지 않는다.
+    """
+    stat = os.stat(file_path)
+    entry = _read_manifest(snapshot_dir).get(os.path.basename(file_path))
+    if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return entry
+    return {
+        'sha256': file_sha256(file_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+
+
+def _snapshot_path(file_path, sha256, snapshot_dir):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(snapshot_dir, f"{stem}-{sha256[:16]}.arrow")
+
+
+def normalize_mixed_columns(df):
+    """숫자와 문자열이 섞인 object 열을 한 가지 타입으로 맞춘다. Arrow 스냅샷은 열마다 타입이 하나여야 한다.
+
+    문자열이 모두 숫자이거나 결측 표기(예: 2021년_경쟁률의 'None')인 열은 숫자로 바꾸고 결측 표기는 NaN으로 둔다.
+    나머지(예: 숫자 하나가 섞인 모집단위)는 문자열로 바꾼다. 엑셀을 직접 읽은 경우와 스냅샷에서 읽은 경우의
+    결과가 같도록 두 경로 모두에서 호출한다.
+    """
+    for column in df.columns[df.dtypes == object]:
+        values = df[column].dropna()
+        is_str = values.map(lambda value: isinstance(value, str))
+        if is_str.all() or not is_str.any():
+            continue
+        strings = values[is_str].str.strip()
+        numeric = pd.to_numeric(strings, errors='coerce')
+        if (numeric.notna() | strings.isin(MISSING_VALUE_STRINGS)).all():
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        else:
+            df[column] = df[column].map(lambda value: value if isinstance(value, str) or pd.isna(value) else str(value))
+    return df
+
+
+def snapshot_path(file_path, snapshot_dir=SNAPSHOT_DIR):
+    """원본의 현재 내용에 해당하는 스냅샷 파일 경로. 파일이 아직 없을 수도 있다."""
+    return _snapshot_path(file_path, snapshot_key(file_path, snapshot_dir)['sha256'], snapshot_dir)
+
+
+def load_snapshot(file_path, snapshot_dir=SNAPSHOT_DIR):
+    """엑셀 파일을 스냅샷에서 읽는다. 원본이 바뀐 경우에만 스냅샷을 다시 만든다."""
+    if feather is None:
+        return normalize_mixed_columns(pd.read_excel(file_path))
+
+    key = snapshot_key(file_path, snapshot_dir)
+    path = _snapshot_path(file_path, key['sha256'], snapshot_dir)
+    if os.path.exists(path):
+        # 메모리 맵으로 열어 페이지 캐시를 그대로 활용한다
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    else:
+        df = normalize_mixed_columns(pd.read_excel(file_path))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            feather.write_feather(df, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+        except (OSError, pa.ArrowException) as e:
+            # 스냅샷 없이 진행하되, 매번 엑셀을 다시 읽게 되므로 경고를 남긴다
+            logger.warning("%s 스냅샷을 만들지 못했습니다: %s", file_path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return df
+
+    manifest = _read_manifest(snapshot_dir)
+    name = os.path.basename(file_path)
+    if manifest.get(name) != {**key, 'snapshot': os.path.basename(path)}:
+        stale = manifest.get(name, {}).get('snapshot')
+        if stale and stale != os.path.basename(path):
+            try:
+                os.remove(os.path.join(snapshot_dir, stale))
+            except OSError:
+                pass
+        manifest[name] = {**key, 'snapshot': os.path.basename(path)}
+        try:
+            _write_manifest(snapshot_dir, manifest)
+        except OSError:
+            pass
+    return df
+
 
-@st.cache_data
 def load_data(file_path):
-    return pd.read_excel(file_path)
+    return load_snapshot(file_path)
+
+
+# 1차 필터링에 쓰는 입결: 선호 백분위 값이 없거나 0/-9999이면 다음 백분위로 대체한다
+ENTRY_SCORE_COLUMN = '입결'
+ENTRY_SCORE_YEAR = '2024'
+ENTRY_SCORE_PERCENTILES = ('70%', '50%')
+MISSING_SCORE_VALUES = [0, -9999]
+
+
+def resolve_entry_score(df, year=ENTRY_SCORE_YEAR, percentiles=ENTRY_SCORE_PERCENTILES):
+    resolved = pd.Series(np.nan, index=df.index)
+    for percentile in reversed(percentiles):
+        scores = df[f'{year}년_입결{percentile}']
+        valid = scores.notna() & ~scores.isin(MISSING_SCORE_VALUES)
+        resolved = scores.where(valid, resolved)
+    return resolved
+
+
+def load_admission_data(file_path):
+    df = load_data(file_path)
+    df[ENTRY_SCORE_COLUMN] = resolve_entry_score(df)
+    return df
 
 def load_json(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
 
-data = load_data('data_240802_1846.xlsx')
-additional_data = load_data('uni_info_summary_240802.xlsx')
-lowest_ability_codes = load_json('lowest_ability_codes.json')
-
 def load_expert_knowledge(file_path='expert_knowledge.txt'):
     with open(file_path, 'r', encoding='utf-8') as file:
         return file.read()
 
-expert_knowledge = load_expert_knowledge()
+
+# 데이터 자산은 import 시점이 아니라 처음 사용될 때 읽어 프로세스 수명 동안 재사용한다
+DatasetHandle = namedtuple('DatasetHandle', ['name', 'version', 'value'])
+
+DATASET_SOURCES = {
+    'data': ('data_240802_1846.xlsx', load_admission_data),
+    'additional_data': ('uni_info_summary_240802.xlsx', load_data),
+    'lowest_ability_codes': ('lowest_ability_codes.json', load_json),
+    'expert_knowledge': ('expert_knowledge.txt', load_expert_knowledge),
+}
+
+
+def build_partition_index(df):
+    from data_index import PartitionIndex
+    return PartitionIndex(df, score_column=ENTRY_SCORE_COLUMN)
+
+
+# 원본 자산에서 파생되는 인덱스. 원본과 같은 버전을 가진다
+DERIVED_DATASETS = {
+    'partition_index': ('data', build_partition_index),
+}
+
+_handles = {}
+_handles_lock = threading.RLock()
+
+
+def _source_version(file_path):
+    if file_path.endswith('.xlsx'):
+        return snapshot_key(file_path)['sha256'][:12]
+    return file_sha256(file_path)[:12]
+
+
+def _load_handle(name):
+    if name in DERIVED_DATASETS:
+        base_name, builder = DERIVED_DATASETS[name]
+        base = get_handle(base_name)
+        return DatasetHandle(name, base.version, builder(base.value))
+    file_path, loader = DATASET_SOURCES[name]
+    value = loader(file_path)
+    return DatasetHandle(name, _source_version(file_path), value)
+
+
+def get_handle(name):
+    """이름에 해당하는 데이터 자산의 버전이 붙은 핸들을 반환한다."""
+    handle = _handles.get(name)
+    if handle is not None:
+        return handle
+    with _handles_lock:
+        handle = _handles.get(name)
+        if handle is None:
+            handle = _load_handle(name)
+            _handles[name] = handle
+    return handle
+
+
+def is_loaded(name):
+    return name in _handles
+
+
+def get_data():
+    return get_handle('data').value
+
+def get_additional_data():
+    return get_handle('additional_data').value
+
+def get_lowest_ability_codes():
+    return get_handle('lowest_ability_codes').value
+
+def get_expert_knowledge():
+    return get_handle('expert_knowledge').value
+
+def get_partition_index():
+    return get_handle('partition_index').value
 
 
+def __getattr__(name):
+    # 기존 `from data_loader import data` 형태의 접근도 지연 로드로 처리한다
+    if name in DATASET_SOURCES:
+        return get_handle(name).value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 SCHOOL_TYPE_ADJUSTMENT = {
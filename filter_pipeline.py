@@ -0,0 +1,87 @@
+# filter_pipeline.py
+import time
+
+import numpy as np
+
+from data_index import rows_to_mask
+from filters import TIERS, MID_BAND, build_filter_spec, compile_filter_spec, get_adjusted_score, \
+    search_range_mask, tier_bounds
+
+
+class FilterPipeline:
+    """세션별 1차 필터링 의존성 그래프.
+
+    기본 지원 가능 여부, 티어별 입결 구간, 검색 범위, 옵션 필터 조건 하나하나, 수능최저 조건을
+    마스터 데이터 길이의 마스크 노드로 보관한다. 노드는 자기 입력이 바뀐 경우에만 다시 계산되고,
+    결과는 캐시된 마스크를 AND해서 만든다.
+    """
+
+    def __init__(self, category):
+        self.category = category
+        self.recomputed = []
+        self.elapsed_ms = 0.0
+        self._nodes = {}
+
+    def _node(self, name, key, compute):
+        cached = self._nodes.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        mask = compute()
+        self._nodes[name] = (key, mask)
+        self.recomputed.append(name)
+        return mask
+
+    def evaluate(self, student_info, filters, search_range, data_handle, index):
+        """티어별 행 위치 배열을 반환한다. first_filter_rows와 같은 결과를 낸다."""
+        start = time.perf_counter()
+        self.recomputed = []
+        if self.category == '교과' and '교과' not in student_info['admission_type']:
+            self.elapsed_ms = (time.perf_counter() - start) * 1000
+            return {tier: np.empty(0, dtype=np.intp) for tier in TIERS}
+
+        data = data_handle.value
+        version = data_handle.version
+        size = index.size
+        adjusted_score = student_info['adjusted_score']
+
+        eligibility = self._node(
+            'eligibility',
+            (version, tuple(student_info['field']), student_info['gender'], student_info['school_type']),
+            lambda: rows_to_mask(index.eligible_rows(self.category, student_info['field'],
+                                                     student_info['gender'], student_info['school_type']), size))
+
+        if student_info.get('lowest_ability_filter'):
+            lowest_ability_limit = student_info['lowest_ability_code']
+        else:
+            lowest_ability_limit = index.max_lowest_ability_code
+        lowest_ability = self._node(
+            'lowest_ability', (version, lowest_ability_limit),
+            lambda: index.lowest_ability_codes <= lowest_ability_limit)
+
+        search = self._node(
+            'search_range',
+            (version, search_range, tuple(student_info['field']), tuple(student_info['detail_fields'])),
+            lambda: search_range_mask(data, student_info, search_range, index))
+
+        base = eligibility & lowest_ability & search
+
+        bounds = tier_bounds(get_adjusted_score(student_info), student_info['high_score_factor'],
+                             student_info['low_score_factor'], MID_BAND)
+        results = {}
+        for tier in TIERS:
+            lower, upper, upper_inclusive = bounds[tier]
+            mask = base & self._node(
+                ('band', tier), (version, lower, upper, upper_inclusive),
+                lambda: rows_to_mask(index.score_index.range_rows(lower, upper, upper_inclusive,
+                                                                  categories=[self.category]), size))
+
+            for condition in build_filter_spec(filters, tier):
+                key = (version, condition, adjusted_score if condition.relative else None)
+                mask &= self._node(
+                    ('option', tier, condition.column), key,
+                    lambda: compile_filter_spec((condition,))(data, adjusted_score))
+
+            results[tier] = np.flatnonzero(mask)
+
+        self.elapsed_ms = (time.perf_counter() - start) * 1000
+        return results
@@ -1,134 +1,269 @@
+import numpy as np
 import pandas as pd
-from data_loader import SCHOOL_TYPE_ADJUSTMENT
+from collections import namedtuple
+from functools import lru_cache
+from data_loader import SCHOOL_TYPE_ADJUSTMENT, ENTRY_SCORE_COLUMN, resolve_entry_score, get_handle, \
+    get_partition_index, is_loaded
+from data_index import PartitionIndex, rows_to_mask
+from category_mapping import DETAIL_TO_MID_CATEGORY
+from memo_cache import ByteLRUCache, canonical_hash
+
+
+# 옵션 필터 조건: 컬럼 <연산자> 기준값 (relative이면 기준값 × adjusted_score)
+FilterCondition = namedtuple('FilterCondition', ['column', 'operator', 'threshold', 'relative'])
+
+# 옵션 필터 컬럼별 비교 방식. 새 지표는 여기에 (연산자, adjusted_score 배수 여부)만 추가하면 된다
+OPTION_FILTER_RULES = {
+    '2024년_경쟁률백분위': ('<', False),
+    '2024년_입결70%변동(%)': ('<', False),
+    '2024년_경쟁률변동(%)': ('>', False),
+    '2024년_충원율(%)': ('>', False),
+    '3개년_충원율_평균': ('>', False),
+    '3개년_입결70%_평균': ('>', True),
+}
+
+COMPARISON_OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+}
+
+
+def build_filter_spec(filters, list_type):
+    """create_option_filters 결과에서 한 티어의 필터 명세(FilterCondition 튜플)를 만든다."""
+    spec = []
+    for column, threshold in filters[list_type].items():
+        if column in OPTION_FILTER_RULES:
+            operator, relative = OPTION_FILTER_RULES[column]
+            spec.append(FilterCondition(column, operator, threshold, relative))
+    return tuple(spec)
+
+
+@lru_cache(maxsize=256)
+def compile_filter_spec(spec):
+    """필터 명세를 하나의 마스크 함수 (df, adjusted_score) -> bool 배열로 컴파일한다.
+
+    명세 해시를 키로 캐시되므로 같은 조건은 한 번만 컴파일된다.
+    """
+    compiled = [(condition.column, COMPARISON_OPERATORS[condition.operator], condition.threshold,
+                 condition.relative) for condition in spec]
+
+    def predicate(df, adjusted_score):
+        mask = np.ones(len(df), dtype=bool)
+        for column, compare, threshold, relative in compiled:
+            if relative:
+                threshold = adjusted_score * threshold
+            mask &= compare(df[column].to_numpy(dtype=float), threshold)
+        return mask
+
+    return predicate
 
 
 def apply_filters(df, filters, student_info, list_type):
-    if not filters[list_type]:
+    spec = build_filter_spec(filters, list_type)
+    if not spec:
         return df
+    return df[compile_filter_spec(spec)(df, student_info['adjusted_score'])]
 
-    for key, value in filters[list_type].items():
-        if '경쟁률백분위' in key or '입결70%변동(%)' in key:
-            df = df[df[key] < value]
-        elif '경쟁률변동(%)' in key or '충원율(%)' in key or '3개년_충원율_평균' in key:
-            df = df[df[key] > value]
-        elif '3개년_입결70%_평균' in key:
-            df = df[df[key] > student_info['adjusted_score'] * value]
-    return df
 
+ADMISSION_CATEGORIES = ('교과', '종합')
+TIERS = ('상향', '적정', '하향')
+MID_BAND = (0.9, 1.1)
 
-def filter_data(student_info, data):
-    filtered_data = data[data['계열'].isin(student_info['field'])]
 
-    if '교과' in student_info['admission_type']:
-        filtered_data = filtered_data[filtered_data['전형구분'] == '교과']
-    else:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def get_adjusted_score(student_info):
+    adjustment_factor = SCHOOL_TYPE_ADJUSTMENT.get(student_info['school_type'], 1.0)
+    return max(student_info['score'] * adjustment_factor, 1.00)
 
-    if student_info['gender'] == '남자':
-        filtered_data = filtered_data[~filtered_data['대학명'].str.contains('여자')]
 
-    if student_info['school_type'] == '과학고':
-        filtered_data = filtered_data[filtered_data['과학고'] == 1]
-    elif student_info['school_type'] == '전사고':
-        filtered_data = filtered_data[filtered_data['전사고'] == 1]
-    elif student_info['school_type'] == '외고':
-        filtered_data = filtered_data[filtered_data['외고'] == 1]
+def tier_bounds(adjusted_score, high_score_factor, low_score_factor, mid_band=MID_BAND):
+    """티어별 입결 구간 (하한, 상한, 상한 포함 여부)를 반환한다."""
+    high_threshold = max(adjusted_score * high_score_factor, 1.00)
+    low_threshold = min(adjusted_score * low_score_factor, 9.00)
+    mid_lower = adjusted_score * mid_band[0]
+    mid_upper = adjusted_score * mid_band[1]
+    return {
+        '상향': (high_threshold, mid_lower, False),
+        '적정': (mid_lower, mid_upper, False),
+        '하향': (mid_upper, low_threshold, True),
+    }
 
-    school_type = student_info['school_type']
-    adjustment_factor = SCHOOL_TYPE_ADJUSTMENT.get(school_type, 1.0)
 
-    adjusted_score = max(student_info['score'] * adjustment_factor, 1.00)
-    high_score_factor = student_info['high_score_factor']
-    low_score_factor = student_info['low_score_factor']
+def with_entry_score(data):
+    if ENTRY_SCORE_COLUMN in data.columns:
+        return data
+    return data.assign(**{ENTRY_SCORE_COLUMN: resolve_entry_score(data)})
 
-    high_threshold = max(adjusted_score * high_score_factor, 1.00)
-    low_threshold = min(adjusted_score * low_score_factor, 9.00)
 
-    def get_entry_score(row):
-        entry_score_70 = row['2024년_입결70%']
-        entry_score_50 = row['2024년_입결50%']
+def partition_index_for(data):
+    """data용 PartitionIndex. 마스터 데이터면 공용 인덱스를 쓰고, 아니면 이번 호출에 필요한 만큼만 만든다.
+
+    임시 인덱스는 소계열 검색어를 미리 훑지 않고, 실제로 검색하는 검색어만 처음 쓰일 때 훑는다.
+    """
+    if is_loaded('data') and data is get_handle('data').value:
+        return get_partition_index()
+    return PartitionIndex(with_entry_score(data), score_column=ENTRY_SCORE_COLUMN, terms=())
 
-        if pd.isna(entry_score_70) or entry_score_70 in [0, -9999]:
-            if pd.isna(entry_score_50) or entry_score_50 in [0, -9999]:
-                return None
-            return entry_score_50
-        return entry_score_70
 
-    filtered_data['입결'] = filtered_data.apply(get_entry_score, axis=1)
-    filtered_data = filtered_data.dropna(subset=['입결'])
+def tier_programs(student_info, data, index=None, mid_band=MID_BAND, high_score_factor=None,
+                  low_score_factor=None):
+    """전형구분 × 티어별 행 위치 배열을 한 번에 구한다.
 
-    high_list = filtered_data[(filtered_data['입결'] >= high_threshold) & (filtered_data['입결'] < adjusted_score * 0.9)]
-    mid_list = filtered_data[
-        (filtered_data['입결'] >= adjusted_score * 0.9) & (filtered_data['입결'] < adjusted_score * 1.1)]
-    low_list = filtered_data[(filtered_data['입결'] >= adjusted_score * 1.1) & (filtered_data['입결'] <= low_threshold)]
+    반환값은 {('교과', '상향'): np.ndarray, ...} 형태이며 배열은 data 기준 위치(iloc)다.
+    index는 data로 만든 PartitionIndex이며, 없으면 partition_index_for(data)를 쓴다.
+    """
+    if high_score_factor is None:
+        high_score_factor = student_info['high_score_factor']
+    if low_score_factor is None:
+        low_score_factor = student_info['low_score_factor']
+    if index is None:
+        index = partition_index_for(data)
 
     # 수능최저역량 필터링 수정
-    if 'lowest_ability_filter' in student_info and student_info['lowest_ability_filter']:
-        high_list = high_list[high_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-        mid_list = mid_list[mid_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-        low_list = low_list[low_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
+    if student_info.get('lowest_ability_filter'):
+        lowest_ability_limit = student_info['lowest_ability_code']
     else:
-        max_code = data['2025년_수능최저코드'].max()
-        high_list = high_list[high_list['2025년_수능최저코드'] <= max_code]
-        mid_list = mid_list[mid_list['2025년_수능최저코드'] <= max_code]
-        low_list = low_list[low_list['2025년_수능최저코드'] <= max_code]
+        lowest_ability_limit = index.max_lowest_ability_code
 
-    return high_list, mid_list, low_list
+    bounds = tier_bounds(get_adjusted_score(student_info), high_score_factor, low_score_factor, mid_band)
 
+    tiers = {}
+    for category in ADMISSION_CATEGORIES:
+        for tier, (lower, upper, upper_inclusive) in bounds.items():
+            rows = index.score_index.range_rows(lower, upper, upper_inclusive,
+                                                categories=[category], fields=student_info['field'])
+            tiers[(category, tier)] = index.filter_rows(rows, student_info['gender'], student_info['school_type'],
+                                                        lowest_ability_limit)
+    return tiers
 
-def filter_data_comprehensive(student_info, data):
-    filtered_data = data[data['계열'].isin(student_info['field'])]
-    filtered_data = filtered_data[filtered_data['전형구분'] == '종합']
 
-    if student_info['gender'] == '남자':
-        filtered_data = filtered_data[~filtered_data['대학명'].str.contains('여자')]
+def programs_in_score_range(data, index, lower, upper, category=None, field=None):
+    """입결이 lower 이상 upper 이하인 모집단위 (예: 2.1 ~ 2.6)."""
+    rows = index.score_index.range_rows(lower, upper, upper_inclusive=True,
+                                        categories=None if category is None else [category],
+                                        fields=None if field is None else [field])
+    return with_entry_score(data).iloc[rows]
 
-    if student_info['school_type'] == '과학고':
-        filtered_data = filtered_data[filtered_data['과학고'] == 1]
-    elif student_info['school_type'] == '전사고':
-        filtered_data = filtered_data[filtered_data['전사고'] == 1]
-    elif student_info['school_type'] == '외고':
-        filtered_data = filtered_data[filtered_data['외고'] == 1]
 
-    school_type = student_info['school_type']
-    adjustment_factor = SCHOOL_TYPE_ADJUSTMENT.get(school_type, 1.0)
+def take_tiers(data, tiers, category):
+    """tier_programs 결과에서 한 전형구분의 상향/적정/하향 DataFrame을 꺼낸다."""
+    data = with_entry_score(data)
+    return tuple(data.iloc[tiers[(category, tier)]] for tier in TIERS)
 
-    adjusted_score = max(student_info['score'] * adjustment_factor, 1.00)
-    high_score_factor = student_info['high_score_factor']
-    low_score_factor = student_info['low_score_factor']
 
-    high_threshold = max(adjusted_score * high_score_factor, 1.00)
-    low_threshold = min(adjusted_score * low_score_factor, 9.00)
+def filter_data(student_info, data, index=None):
+    if '교과' not in student_info['admission_type']:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    return take_tiers(data, tier_programs(student_info, data, index), '교과')
 
-    def get_entry_score(row):
-        entry_score_70 = row['2024년_입결70%']
-        entry_score_50 = row['2024년_입결50%']
 
-        if pd.isna(entry_score_70) or entry_score_70 in [0, -9999]:
-            if pd.isna(entry_score_50) or entry_score_50 in [0, -9999]:
-                return None
-            return entry_score_50
-        return entry_score_70
+def filter_data_comprehensive(student_info, data, index=None):
+    return take_tiers(data, tier_programs(student_info, data, index), '종합')
 
-    filtered_data['입결'] = filtered_data.apply(get_entry_score, axis=1)
-    filtered_data = filtered_data.dropna(subset=['입결'])
 
-    high_list = filtered_data[(filtered_data['입결'] >= high_threshold) & (filtered_data['입결'] < adjusted_score * 0.9)]
-    mid_list = filtered_data[
-        (filtered_data['입결'] >= adjusted_score * 0.9) & (filtered_data['입결'] < adjusted_score * 1.1)]
-    low_list = filtered_data[(filtered_data['입결'] >= adjusted_score * 1.1) & (filtered_data['입결'] <= low_threshold)]
+def get_mid_categories(student_info):
+    return list(set([DETAIL_TO_MID_CATEGORY.get(field, "") for field in student_info['detail_fields']]))
 
-    # 수능최저역량 필터링 수정
-    if 'lowest_ability_filter' in student_info and student_info['lowest_ability_filter']:
-        high_list = high_list[high_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-        mid_list = mid_list[mid_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-        low_list = low_list[low_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-    else:
-        max_code = data['2025년_수능최저코드'].max()
-        high_list = high_list[high_list['2025년_수능최저코드'] <= max_code]
-        mid_list = mid_list[mid_list['2025년_수능최저코드'] <= max_code]
-        low_list = low_list[low_list['2025년_수능최저코드'] <= max_code]
 
-    return high_list, mid_list, low_list
+def search_range_rows(student_info, search_range, index):
+    """검색 범위에 드는 마스터 데이터 행 위치. 범위 제한이 없으면 None."""
+    if search_range == "대계열 검색":
+        return index.rows('계열', student_info['field'])
+    elif search_range == "중계열 검색":
+        return index.rows('계열구분', get_mid_categories(student_info))
+    elif search_range == "소계열 검색":
+        return index.term_index.rows_any(student_info['detail_fields'])
+    return None
+
+
+def search_range_mask(df, student_info, search_range, index=None, rows=None):
+    """df 각 행이 검색 범위에 드는지 여부.
+
+    index가 있으면 게시 목록으로 계산한다. 이때 rows는 df 행의 마스터 데이터 위치이며,
+    생략하면 df가 마스터 데이터 자체라고 본다.
+    """
+    if index is not None:
+        matched = search_range_rows(student_info, search_range, index)
+        if matched is None:
+            return np.ones(len(df), dtype=bool)
+        if rows is None:
+            return rows_to_mask(matched, index.size)
+        return np.isin(rows, matched, assume_unique=True)
 
+    if search_range == "대계열 검색":
+        return df['계열'].isin(student_info['field']).to_numpy()
 
+    elif search_range == "중계열 검색":
+        return df['계열구분'].isin(get_mid_categories(student_info)).to_numpy()
+
+    elif search_range == "소계열 검색":
+        return df['계열상세명'].apply(
+            lambda x: any(field.lower() in str(x).lower() for field in student_info['detail_fields'])).to_numpy(dtype=bool)
+
+    return np.ones(len(df), dtype=bool)
+
+
+def filter_by_search_range(df, student_info, search_range):
+    if df.empty:
+        return df
+    return df[search_range_mask(df, student_info, search_range)]
+
+
+def first_filter_rows(student_info, category, filters, search_range, data, index=None):
+    """1차 필터링 (티어 구분 → 검색 범위 → 옵션 필터)을 거친 티어별 행 위치를 반환한다."""
+    if category == '교과' and '교과' not in student_info['admission_type']:
+        return {tier: np.empty(0, dtype=np.intp) for tier in TIERS}
+
+    if index is None:
+        index = partition_index_for(data)
+    tiers = tier_programs(student_info, data, index)
+    results = {}
+    for tier in TIERS:
+        rows = tiers[(category, tier)]
+        subset = data.iloc[rows]
+        keep = search_range_mask(subset, student_info, search_range, index, rows)
+        spec = build_filter_spec(filters, tier)
+        if spec:
+            keep &= compile_filter_spec(spec)(subset, student_info['adjusted_score'])
+        results[tier] = rows[keep]
+    return results
+
+
+# 1차 필터링 결과에 영향을 주는 student_info 항목
+FIRST_FILTER_FIELDS = (
+    'school_type', 'field', 'detail_fields', 'score', 'adjusted_score', 'gender', 'admission_type',
+    'high_score_factor', 'low_score_factor', 'lowest_ability_filter', 'lowest_ability_code',
+)
+
+# 세션 전체가 공유하는 1차 필터링 결과 캐시 (행 위치 배열만 저장)
+first_filter_cache = ByteLRUCache(max_bytes=32 * 1024 * 1024)
+
+
+def first_filter_key(student_info, category, filters, search_range, data_version):
+    return canonical_hash({
+        'student_info': {field: student_info.get(field) for field in FIRST_FILTER_FIELDS},
+        'category': category,
+        'filters': filters,
+        'search_range': search_range,
+        'data_version': data_version,
+    })
+
+
+def cached_first_filter_rows(student_info, category, filters, search_range, pipeline=None):
+    """first_filter_rows를 마스터 데이터에 대해 실행하고 결과를 프로세스 전역 캐시에 보관한다.
+
+    캐시에 없으면 세션의 FilterPipeline이 있는 경우 바뀐 노드만 다시 계산한다.
+    """
+    handle = get_handle('data')
+    key = first_filter_key(student_info, category, filters, search_range, handle.version)
+    rows = first_filter_cache.get(key)
+    if rows is None:
+        if pipeline is not None:
+            rows = pipeline.evaluate(student_info, filters, search_range, handle, get_partition_index())
+        else:
+            rows = first_filter_rows(student_info, category, filters, search_range, handle.value,
+                                     get_partition_index())
+        first_filter_cache.put(key, rows)
+    return rows
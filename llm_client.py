@@ -0,0 +1,203 @@
+# llm_client.py
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque, namedtuple
+
+from prompt_builder import estimate_tokens
+
+# openai/httpx는 import가 무거우므로 클라이언트를 처음 만들 때 불러온다
+# 분당 요청 수/토큰 수 한도. 계정 등급에 맞게 환경 변수로 조정한다
+LLM_RPM = int(os.getenv('LLM_RPM', '500'))
+LLM_TPM = int(os.getenv('LLM_TPM', '200000'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '5'))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '0.5'))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '20'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+
+LLMCallRecord = namedtuple('LLMCallRecord', ['model', 'latency', 'prompt_tokens', 'completion_tokens',
+                                             'attempts', 'throttle_wait', 'ok'])
+
+
+class TokenBucket:
+    """분당 rate_per_minute만큼 채워지는 토큰 버킷. acquire()는 필요한 만큼 찰 때까지 기다린다."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """amount만큼 꺼낸다. 기다린 시간(초)을 반환한다."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, delta):
+        """미리 꺼낸 추정치와 실제 사용량의 차이를 반영한다. 양수면 더 쓴 것이다."""
+        with self._lock:
+            self._refill()
+            self.tokens -= delta
+
+
+def is_retryable(error):
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def retry_delay(error, attempt):
+    """Retry-After 헤더가 있으면 따르고, 없으면 지수 백오프에 전체 지터를 적용한다."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('retry-after')
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMClient:
+    """프로세스 전체가 함께 쓰는 OpenAI chat.completions 클라이언트.
+
+    keep-alive 연결 풀 하나를 공유하고, 요청 전 RPM/TPM 토큰 버킷을 통과시키며, 429/5xx/연결 오류는
+    지터를 준 지수 백오프로 다시 시도한다. 호출마다 지연 시간과 토큰 사용량을 기록한다.
+    """
+
+    def __init__(self, api_key=None, base_url=None, rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES,
+                 max_connections=LLM_MAX_CONNECTIONS):
+        import httpx
+        from openai import OpenAI
+
+        http_client = httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                       max_keepalive_connections=max_connections))
+        # 재시도는 여기서 직접 하므로 SDK 자체 재시도는 끈다
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.records = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def _create(self, messages, model, max_tokens, timeout, **kwargs):
+        """한도를 기다린 뒤 요청하고, 재시도할 수 있는 오류면 다시 보낸다. (응답, 시도 횟수, 대기 시간, 추정 토큰).
+
+        끝내 실패하면 마지막 오류에 실제 시도 횟수(llm_attempts)와 대기 시간(llm_throttle_wait)을 붙여 다시 던진다.
+        """
+        estimated = sum(estimate_tokens(message['content']) for message in messages) + max_tokens
+        throttle_wait = 0.0
+        for attempt in range(self.max_retries + 1):
+            throttle_wait += self.request_bucket.acquire()
+            throttle_wait += self.token_bucket.acquire(estimated)
+            try:
+                response = self.client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens, timeout=timeout, **kwargs)
+                return response, attempt + 1, throttle_wait, estimated
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    e.llm_attempts = attempt + 1
+                    e.llm_throttle_wait = throttle_wait
+                    raise
+                time.sleep(retry_delay(e, attempt))
+
+    def _record(self, model, start, usage, estimated, attempts, throttle_wait, ok, completion_text=""):
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            self.token_bucket.adjust(prompt_tokens + completion_tokens - estimated)
+        else:
+            prompt_tokens, completion_tokens = None, estimate_tokens(completion_text) if ok else None
+        with self._lock:
+            self.records.append(LLMCallRecord(model, time.perf_counter() - start, prompt_tokens, completion_tokens,
+                                              attempts, throttle_wait, ok))
+
+    def complete(self, messages, model, max_tokens, timeout):
+        start = time.perf_counter()
+        try:
+            response, attempts, throttle_wait, estimated = self._create(messages, model, max_tokens, timeout)
+        except Exception as e:
+            self._record(model, start, None, 0, getattr(e, 'llm_attempts', 1), getattr(e, 'llm_throttle_wait', 0.0),
+                         False)
+            raise
+        text = response.choices[0].message.content
+        self._record(model, start, response.usage, estimated, attempts, throttle_wait, True, text)
+        return text
+
+    def stream(self, messages, model, max_tokens, timeout):
+        """응답 텍스트 조각을 도착하는 대로 내준다. 재시도는 첫 조각을 받기 전(요청 단계) 오류에만 적용된다."""
+        start = time.perf_counter()
+        try:
+            stream, attempts, throttle_wait, estimated = self._create(
+                messages, model, max_tokens, timeout, stream=True, stream_options={"include_usage": True})
+        except Exception as e:
+            self._record(model, start, None, 0, getattr(e, 'llm_attempts', 1), getattr(e, 'llm_throttle_wait', 0.0),
+                         False)
+            raise
+        usage = None
+        parts = []
+        ok = False
+        try:
+            for chunk in stream:
+                if getattr(chunk, 'usage', None) is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            ok = True
+        finally:
+            self._record(model, start, usage, estimated, attempts, throttle_wait, ok, "".join(parts))
+
+    def stats(self):
+        with self._lock:
+            records = list(self.records)
+        latencies = sorted(record.latency for record in records if record.ok)
+        return {
+            'calls': len(records),
+            'failures': sum(not record.ok for record in records),
+            'retries': sum(record.attempts - 1 for record in records),
+            'throttle_wait': sum(record.throttle_wait for record in records),
+            'mean_latency': statistics.fmean(latencies) if latencies else 0.0,
+            'p95_latency': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            'prompt_tokens': sum(record.prompt_tokens or 0 for record in records),
+            'completion_tokens': sum(record.completion_tokens or 0 for record in records),
+        }
+
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """API_KEY와 LLM_BASE_URL(비우면 OpenAI 기본 주소) 환경 변수로 만든 공용 클라이언트."""
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = LLMClient(api_key=os.getenv('API_KEY'), base_url=os.getenv('LLM_BASE_URL') or None)
+        return _llm_client
+
+
+def configure_llm_client(**kwargs):
+    """공용 클라이언트를 주어진 설정(예: 로컬 모의 서버 base_url)으로 바꾼다."""
+    global _llm_client
+    with _llm_client_lock:
+        _llm_client = LLMClient(**kwargs)
+        return _llm_client
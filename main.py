@@ -1,10 +1,16 @@
 import streamlit as st
-from tabs import info_input, subject_filtering, comprehensive_filtering, final_filtering, report_generation
-from data_loader import data, lowest_ability_codes
-from data_loader import data, lowest_ability_codes, additional_data
-import streamlit as st
+from dotenv import load_dotenv
+
+# 모듈 상수들이 환경 변수를 읽기 전에 .env를 먼저 읽는다
+load_dotenv()
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import yaml
 import streamlit_authenticator as stauth
+from prewarm import start_chart_prewarm, start_prewarm
+
+# 데이터, 인덱스, 탭 모듈은 백그라운드에서 올리고 로그인 화면은 바로 그린다
+start_prewarm()
 
 with open('config.yaml') as file:
     config = yaml.load(file, Loader=stauth.SafeLoader)
@@ -37,11 +43,18 @@ if authentication_status:
     ## 로그인 후 기능들 작성 ##
 
     def main():
+        # 탭 모듈(pandas, 필터, 보고서 코드)은 로그인 뒤에 불러온다. pre-warm이 먼저 끝냈다면 이미 올라와 있다
+        from tabs import info_input, subject_filtering, comprehensive_filtering, final_filtering, report_generation
+        from session_metrics import record_session_state
+        from ui_components import display_session_state_usage, display_tab_timings
+
+        # 차트 워커 풀은 서버 프로세스에서만 띄운다 (보고서 탭보다 먼저 시작해 둔다)
+        start_chart_prewarm()
+
         st.title("🖋️️ 지략 수시전략 컨설팅 지원 시스템 ")
         st.markdown("&nbsp;")
         tabs = st.tabs(["정보입력", "교과 필터링", "학종 필터링", "최종 필터링", "보고서 작성"])
-        st.session_state['additional_data'] = additional_data
-    
+
         with tabs[0]:
             info_input.show_info_input()
         with tabs[1]:
@@ -53,5 +66,12 @@ if authentication_status:
         with tabs[4]:
             report_generation.show_report_generation()
 
+        # 각 탭은 프래그먼트라 탭 안의 조작은 그 탭만 다시 실행한다. 아래는 앱 전체가 실행될 때만 갱신된다
+        # 실행이 끝날 때마다 이 세션의 session_state 크기를 기록한다
+        record_session_state(get_script_run_ctx().session_id, username, st.session_state)
+        with st.sidebar:
+            display_session_state_usage()
+            display_tab_timings()
+
     if __name__ == "__main__":
         main()
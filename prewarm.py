@@ -0,0 +1,98 @@
+# prewarm.py
+# 서버가 뜬 뒤 첫 실행에서 백그라운드 스레드 하나를 띄워 데이터, 인덱스, 탭 모듈을 미리 올린다.
+# 차트 워커 풀(폰트 포함)은 첫 로그인 뒤 main()에서 따로 띄운다. 로그인 화면은 이 작업을 기다리지 않는다.
+import multiprocessing
+import os
+import threading
+import time
+
+import streamlit as st
+
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', '1') != '0'
+# 단계 이름: (소요 시간(초), 오류 메시지 또는 None)
+prewarm_timings = {}
+
+
+def _warm_datasets():
+    from data_loader import DATASET_SOURCES, get_handle
+
+    # 파티션 인덱스가 원본 데이터를 함께 읽는다
+    get_handle('partition_index')
+    for name in DATASET_SOURCES:
+        get_handle(name)
+
+
+def _warm_tab_modules():
+    import tabs.comprehensive_filtering  # noqa: F401
+    import tabs.final_filtering  # noqa: F401
+    import tabs.info_input  # noqa: F401
+    import tabs.report_generation  # noqa: F401
+    import tabs.subject_filtering  # noqa: F401
+
+
+def _warm_llm_client():
+    if not os.getenv('API_KEY'):
+        return
+    from llm_client import get_llm_client
+
+    get_llm_client()
+
+
+def _warm_chart_backend():
+    from charts import CHART_WORKERS, get_chart_pool
+
+    # 워커를 모두 띄워 initializer(matplotlib/seaborn import, 한글 폰트 등록)를 미리 끝낸다
+    pool = get_chart_pool()
+    for future in [pool.submit(os.getpid) for _ in range(CHART_WORKERS)]:
+        future.result()
+
+
+PREWARM_STEPS = [
+    ('datasets', _warm_datasets),
+    ('tab_modules', _warm_tab_modules),
+    ('llm_client', _warm_llm_client),
+]
+CHART_PREWARM_STEPS = [
+    ('chart_backend', _warm_chart_backend),
+]
+
+
+def prewarm(steps=PREWARM_STEPS):
+    for name, step in steps:
+        start = time.perf_counter()
+        error = None
+        try:
+            step()
+        except Exception as e:
+            # 미리 올리지 못한 것은 처음 쓸 때 다시 시도되므로 기록만 남긴다
+            error = f"{type(e).__name__}: {e}"
+        prewarm_timings[name] = (time.perf_counter() - start, error)
+
+
+def _should_prewarm():
+    # 멀티프로세싱 자식 프로세스가 main.py를 다시 실행하더라도 거기서는 데이터를 읽거나 프로세스를 띄우지 않는다
+    return PREWARM_ENABLED and multiprocessing.parent_process() is None
+
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """프로세스당 한 번만 pre-warm 스레드를 시작한다."""
+    if not _should_prewarm():
+        return None
+    thread = threading.Thread(target=prewarm, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def start_chart_prewarm():
+    """서버 프로세스에서 한 번만 차트 워커 풀을 미리 띄운다.
+
+    워커를 띄우는 일은 스크립트 맨 위가 아니라 로그인 뒤 main()에서만 부른다. main()은 __name__이 "__main__"일 때만
+    실행되므로, 스크립트가 다른 이름(__mp_main__)으로 다시 실행되어도 풀을 만들지 않는다.
+    """
+    if not _should_prewarm():
+        return None
+    thread = threading.Thread(target=prewarm, args=(CHART_PREWARM_STEPS,), name='prewarm-charts', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,101 @@
+# prompt_builder.py
+import os
+import re
+import textwrap
+from collections import namedtuple
+
+import pandas as pd
+
+from data_loader import get_expert_knowledge
+
+# 프롬프트 하나에 허용하는 (어림) 토큰 수. 넘으면 데이터 구간의 뒤쪽 행부터 뺀다
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '3000'))
+
+_HANGUL = re.compile('[가-힣]')
+
+# head는 항상 남기는 줄(표 머리글, 공통 값), rows는 예산을 넘으면 뒤에서부터 빼는 줄
+PromptSection = namedtuple('PromptSection', ['title', 'head', 'rows', 'separator'])
+
+
+def estimate_tokens(text):
+    """토크나이저 없이 토큰 수를 어림한다. 한글은 글자당 1토큰, 나머지는 4글자당 1토큰으로 센다."""
+    hangul = len(_HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def is_missing(value):
+    return not isinstance(value, (list, tuple)) and pd.isna(value)
+
+
+def format_prompt_value(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(v) for v in value)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.2f}".rstrip('0')
+    return str(value)
+
+
+def compact_table(title, df, fields):
+    """df에서 fields 열만 골라 '|' 구분 표로 만든다.
+
+    모두 비어 있는 열은 빼고, 모든 행에서 값이 같은 열은 '공통' 줄에 한 번만 적는다. 빈 칸은 공백으로 둔다.
+    """
+    columns = list(dict.fromkeys(field for field in fields if field in df.columns))
+    table = df[columns].dropna(axis=1, how='all')
+    head = []
+    if len(table) > 1:
+        constant = [column for column in table.columns
+                    if table[column].notna().all() and table[column].nunique() == 1]
+        if constant:
+            head.append("공통: " + "; ".join(f"{column}={format_prompt_value(table[column].iloc[0])}"
+                                             for column in constant))
+            table = table.drop(columns=constant)
+    head.append('|'.join(table.columns))
+    rows = ['|'.join('' if is_missing(value) else format_prompt_value(value) for value in row)
+            for row in table.itertuples(index=False)]
+    return PromptSection(title, head, rows, '\n')
+
+
+def compact_record(title, record, fields):
+    """dict나 Series 하나에서 fields만 골라 'key=value; ...' 한 줄로 만든다. 빈 값은 뺀다.
+
+    fields 순서가 우선순위이며, 예산을 넘으면 뒤쪽 필드부터 빠진다.
+    """
+    rows = [f"{field}={format_prompt_value(record[field])}"
+            for field in dict.fromkeys(fields)
+            if field in record and not is_missing(record[field])]
+    return PromptSection(title, [], rows, '; ')
+
+
+def render_section(section):
+    return f"{section.title}:\n" + "\n".join(section.head + [section.separator.join(section.rows)]).strip()
+
+
+def assemble_prompt(task, sections, requirements, budget=PROMPT_TOKEN_BUDGET):
+    """전문지식을 맨 앞에 두고 작업 설명, 데이터 구간, 요구사항 순으로 프롬프트를 조립한다.
+
+    모든 프롬프트가 같은 전문지식 접두부로 시작하므로 제공자 쪽 프롬프트 캐시가 적용될 수 있다.
+    예산을 넘으면 가장 긴 데이터 구간의 마지막 행을 하나씩 빼고, 뺀 행 수를 끝에 적는다.
+    """
+    sections = [PromptSection(s.title, list(s.head), list(s.rows), s.separator) for s in sections]
+    prefix = f"전문지식:\n{get_expert_knowledge()}\n\n{task.strip()}\n\n"
+    suffix = f"\n\n요구사항:\n{textwrap.dedent(requirements).strip()}\n"
+
+    def render(dropped):
+        body = "\n\n".join(render_section(section) for section in sections)
+        if dropped:
+            body += f"\n(토큰 예산 때문에 {dropped}개 항목 생략)"
+        return prefix + body + suffix
+
+    dropped = 0
+    prompt = render(dropped)
+    while estimate_tokens(prompt) > budget:
+        longest = max(sections, key=lambda section: len(section.rows), default=None)
+        if longest is None or not longest.rows:
+            break
+        longest.rows.pop()
+        dropped += 1
+        prompt = render(dropped)
+    return prompt
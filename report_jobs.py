@@ -0,0 +1,223 @@
+# report_jobs.py
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+REPORT_JOB_DB_PATH = os.getenv('REPORT_JOB_DB_PATH', os.path.join('.cache', 'report_jobs.sqlite3'))
+REPORT_JOB_WORKERS = int(os.getenv('REPORT_JOB_WORKERS', '3'))
+# 끝난 작업은 사용자별로 최근 REPORT_JOB_KEEP_PER_OWNER건만, 최대 REPORT_JOB_TTL초 동안 보관한다
+REPORT_JOB_KEEP_PER_OWNER = int(os.getenv('REPORT_JOB_KEEP_PER_OWNER', '20'))
+REPORT_JOB_TTL = float(os.getenv('REPORT_JOB_TTL', str(7 * 24 * 3600)))
+# 이보다 오래 대기/실행 중인 작업은 어느 프로세스의 것이든 멈춘 것으로 본다
+REPORT_JOB_STALE_AFTER = float(os.getenv('REPORT_JOB_STALE_AFTER', str(3600)))
+ACTIVE_STATUSES = ('queued', 'running')
+JOB_FIELDS = ('id', 'owner', 'label', 'status', 'progress', 'stage', 'created', 'started', 'finished', 'error')
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # Windows에서 os.kill(pid, 0)은 확인이 아니라 신호 전송이므로 살아 있다고 보고 시간 기준에만 맡긴다
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ReportJobRunner:
+    """보고서 생성 작업을 백그라운드 스레드에서 돌리고 상태와 결과를 SQLite 작업 테이블에 남기는 실행기.
+
+    submit()은 작업 id를 바로 돌려준다. 화면은 jobs()/job()으로 진행 상태를 읽고, 끝난 작업의 결과는
+    브라우저를 새로 고치거나 다른 보고서를 만든 뒤에도 result(id)로 다시 가져올 수 있다.
+
+    여러 서버 프로세스가 같은 DB 파일을 써도 되도록 작업마다 만든 프로세스(host, pid, boot_id)를 기록하고,
+    시작할 때는 이미 종료된 프로세스의 작업만 실패로 표시한다.
+    """
+
+    def __init__(self, path=REPORT_JOB_DB_PATH, max_workers=REPORT_JOB_WORKERS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_jobs (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                label TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                stage TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                error TEXT,
+                result BLOB,
+                host TEXT,
+                pid INTEGER,
+                boot_id TEXT
+            )
+        """)
+        # 이전 버전에서 만든 테이블에는 프로세스 열이 없다
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(report_jobs)")}
+        for column, column_type in [('host', 'TEXT'), ('pid', 'INTEGER'), ('boot_id', 'TEXT')]:
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE report_jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS report_jobs_owner ON report_jobs (owner, created)")
+        # 작업이 끝나기 전에 화면에 보여 줄 중간 결과. 구간마다 갱신할 때 version을 올리고, 작업이 끝나면 지운다
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_job_sections (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                content BLOB NOT NULL,
+                PRIMARY KEY (job_id, position)
+            )
+        """)
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.boot_id = uuid.uuid4().hex
+        self._fail_orphaned_jobs()
+        for (owner,) in self._conn.execute("SELECT DISTINCT owner FROM report_jobs").fetchall():
+            self._prune(owner)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+
+    def _fail_orphaned_jobs(self):
+        """끝나지 못한 채 남은 작업 중 만든 프로세스가 이미 종료된 것만 실패로 표시한다.
+
+        같은 호스트에서 pid가 살아 있는 다른 서버 프로세스의 작업은 건드리지 않는다. 다른 호스트의 작업이나
+        pid를 확인할 수 없는 작업은 REPORT_JOB_STALE_AFTER가 지난 경우에만 실패로 본다.
+        """
+        placeholders = ", ".join("?" * len(ACTIVE_STATUSES))
+        rows = self._conn.execute(
+            f"SELECT id, host, pid, boot_id, created FROM report_jobs WHERE status IN ({placeholders})",
+            ACTIVE_STATUSES).fetchall()
+        stale_before = time.time() - REPORT_JOB_STALE_AFTER
+        for job_id, host, pid, boot_id, created in rows:
+            if host == self.host and pid is not None:
+                # 이 프로세스는 방금 시작했으므로 같은 pid의 작업은 pid를 물려받기 전 프로세스의 것이다
+                orphaned = pid == self.pid or not _pid_alive(pid)
+            else:
+                orphaned = created < stale_before
+            if orphaned:
+                self._conn.execute("UPDATE report_jobs SET status = 'failed', error = ? WHERE id = ?",
+                                   ('서버가 다시 시작되어 중단되었습니다.', job_id))
+                self._conn.execute("DELETE FROM report_job_sections WHERE job_id = ?", (job_id,))
+
+    def _prune(self, owner):
+        """owner의 끝난 작업 중 최근 REPORT_JOB_KEEP_PER_OWNER건만 남기고, REPORT_JOB_TTL이 지난 작업은 지운다."""
+        placeholders = ", ".join("?" * len(ACTIVE_STATUSES))
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM report_jobs WHERE owner = ? AND status NOT IN ({placeholders}) AND (created < ? OR id NOT IN ("
+                f"SELECT id FROM report_jobs WHERE owner = ? AND status NOT IN ({placeholders}) "
+                f"ORDER BY created DESC LIMIT ?))",
+                (owner, *ACTIVE_STATUSES, time.time() - REPORT_JOB_TTL, owner, *ACTIVE_STATUSES,
+                 REPORT_JOB_KEEP_PER_OWNER))
+            self._conn.execute("DELETE FROM report_job_sections WHERE job_id NOT IN (SELECT id FROM report_jobs)")
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE report_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, owner, label, func, *args, **kwargs):
+        """func(*args, on_progress=콜백, on_section=콜백, **kwargs)를 백그라운드에서 실행하고 작업 id를 반환한다.
+
+        on_progress(비율, 단계 이름)는 작업 스레드에서 불리며 진행 상태를 작업 테이블에 기록한다.
+        on_section(위치, 값)은 위치별 중간 결과를 저장하며, 같은 위치에 다시 부르면 값을 바꾼다.
+        """
+        self._prune(owner)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("INSERT INTO report_jobs (id, owner, label, status, created, host, pid, boot_id) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (job_id, owner, label, 'queued', time.time(), self.host, self.pid, self.boot_id))
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status='running', started=time.time())
+
+        def on_progress(fraction, stage):
+            self._update(job_id, progress=fraction, stage=stage)
+
+        def on_section(position, value):
+            content = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO report_job_sections (job_id, position, version, content) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (job_id, position) DO UPDATE SET version = version + 1, content = excluded.content",
+                    (job_id, position, content))
+
+        try:
+            result = func(*args, on_progress=on_progress, on_section=on_section, **kwargs)
+        except Exception as e:
+            self._update(job_id, status='failed', finished=time.time(), error=f"{type(e).__name__}: {e}")
+        else:
+            self._update(job_id, status='done', progress=1.0, finished=time.time(),
+                         result=pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        # 끝난 작업은 result로 읽으므로 중간 결과는 더 필요 없다
+        with self._lock:
+            self._conn.execute("DELETE FROM report_job_sections WHERE job_id = ?", (job_id,))
+
+    def job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM report_jobs WHERE id = ?",
+                                     (job_id,)).fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row is not None else None
+
+    def jobs(self, owner, limit=20):
+        """owner의 최근 작업 목록(최신순). 결과 본문은 포함하지 않는다."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM report_jobs WHERE owner = ? ORDER BY created DESC LIMIT ?",
+                (owner, limit)).fetchall()
+        return [dict(zip(JOB_FIELDS, row)) for row in rows]
+
+    def section_versions(self, job_id):
+        """진행 중인 작업의 중간 결과 {위치: version}. 화면은 바뀐 위치만 sections()로 다시 읽는다."""
+        with self._lock:
+            rows = self._conn.execute("SELECT position, version FROM report_job_sections WHERE job_id = ?",
+                                      (job_id,)).fetchall()
+        return dict(rows)
+
+    def sections(self, job_id, positions):
+        """positions 위치의 중간 결과 {위치: (version, 값)}."""
+        positions = list(positions)
+        if not positions:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT position, version, content FROM report_job_sections WHERE job_id = ? "
+                f"AND position IN ({', '.join('?' * len(positions))})", (job_id, *positions)).fetchall()
+        return {position: (version, pickle.loads(content)) for position, version, content in rows}
+
+    def result(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM report_jobs WHERE id = ? AND status = 'done'",
+                                     (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return pickle.loads(row[0])
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_report_job_runner():
+    """프로세스 공용 작업 실행기. 모든 세션이 같은 작업 테이블과 스레드 풀을 쓴다."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ReportJobRunner()
+        return _runner
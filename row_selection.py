@@ -0,0 +1,43 @@
+# row_selection.py
+# 필터링 단계 사이에서는 마스터 테이블(get_data())의 행 위치(행 id) 배열만 주고받고,
+# 화면에 보여 줄 때만 필요한 열을 골라 DataFrame으로 만든다.
+import numpy as np
+import pandas as pd
+
+from data_loader import get_data
+
+ROW_ID_DTYPE = np.int32
+EMPTY_ROWS = np.empty(0, dtype=ROW_ID_DTYPE)
+
+
+def as_row_ids(rows):
+    return np.asarray(rows, dtype=ROW_ID_DTYPE)
+
+
+def concat_row_ids(row_sets):
+    row_sets = [rows for rows in row_sets if len(rows)]
+    if not row_sets:
+        return EMPTY_ROWS
+    return as_row_ids(np.concatenate(row_sets))
+
+
+def materialize_rows(rows, columns=None):
+    """행 id 배열을 마스터 테이블의 DataFrame으로 만든다. columns를 주면 그 열만 가져오고, index는 행 id다."""
+    data = get_data()
+    rows = as_row_ids(rows)
+    if columns is None:
+        df = data.iloc[rows]
+    else:
+        df = data.iloc[rows, data.columns.get_indexer([column for column in columns if column in data.columns])]
+    df.index = pd.Index(rows, name='row_id')
+    return df
+
+
+def university_names(rows):
+    return get_data()['대학명'].to_numpy()[as_row_ids(rows)]
+
+
+def rows_in_universities(rows, universities):
+    """rows 중 대학명이 universities에 속하는 행 id만 원래 순서대로 남긴다."""
+    rows = as_row_ids(rows)
+    return rows[np.isin(university_names(rows), list(universities))]
@@ -0,0 +1,32 @@
+# session_metrics.py
+import threading
+import time
+
+from memo_cache import estimate_nbytes
+
+# 세션 id -> (사용자, session_state 추정 바이트, 갱신 시각). 스크립트가 실행될 때마다 갱신된다
+_session_bytes = {}
+_session_bytes_lock = threading.Lock()
+
+
+def session_state_sizes(state):
+    """session_state 키별 추정 바이트를 큰 순서로 반환한다."""
+    sizes = [(str(key), estimate_nbytes(value)) for key, value in state.items()]
+    return sorted(sizes, key=lambda item: item[1], reverse=True)
+
+
+def record_session_state(session_id, owner, state):
+    total = sum(size for _, size in session_state_sizes(state))
+    with _session_bytes_lock:
+        _session_bytes[session_id] = (owner, total, time.time())
+    return total
+
+
+def session_state_report(max_age=3600):
+    """최근 max_age초 안에 실행된 세션들의 (세션 id, 사용자, 바이트, 갱신 시각) 목록. 큰 순서."""
+    cutoff = time.time() - max_age
+    with _session_bytes_lock:
+        for session_id in [sid for sid, (_, _, updated) in _session_bytes.items() if updated < cutoff]:
+            del _session_bytes[session_id]
+        report = [(session_id, *entry) for session_id, entry in _session_bytes.items()]
+    return sorted(report, key=lambda item: item[2], reverse=True)
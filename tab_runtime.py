@@ -0,0 +1,79 @@
+# tab_runtime.py
+# 탭마다 st.fragment로 감싸 탭 안의 조작은 그 탭만 다시 실행한다. 탭끼리 넘기는 값(student_info, saved_*_results,
+# final_selection)은 publish()로 버전을 올리고 앱 전체를 한 번 다시 실행해 다른 탭에 알린다.
+import functools
+import os
+import statistics
+import time
+from collections import deque
+
+import streamlit as st
+
+# 0이면 프래그먼트 없이 예전처럼 매번 모든 탭을 실행한다 (전후 비교용)
+TAB_FRAGMENTS = os.getenv('TAB_FRAGMENTS', '1') != '0'
+TAB_TIMING_HISTORY = 50
+
+
+def state_version(name):
+    return st.session_state.get('state_versions', {}).get(name, 0)
+
+
+def publish(name, notice=None):
+    """name 값이 바뀌었음을 알린다. 버전을 올리고 앱 전체를 다시 실행하므로 이 호출 뒤의 코드는 실행되지 않는다.
+
+    notice는 다시 실행된 뒤 show_notice(name)로 한 번 보여 줄 완료 메시지다.
+    """
+    versions = st.session_state.setdefault('state_versions', {})
+    versions[name] = versions.get(name, 0) + 1
+    if notice is not None:
+        st.session_state.setdefault('state_notices', {})[name] = notice
+    st.rerun()
+
+
+def show_notice(name):
+    """publish()가 남긴 완료 메시지를 한 번 보여 준다. 메시지가 있었으면 True."""
+    notice = st.session_state.get('state_notices', {}).pop(name, None)
+    if notice is None:
+        return False
+    st.success(notice)
+    return True
+
+
+def invalidate_on_change(owner, names, keys):
+    """owner가 지난번에 본 names의 버전이 바뀌었으면 owner의 결과 keys를 지운다. 지운 것이 있으면 True."""
+    seen_key = f"{owner}_seen_versions"
+    current = {name: state_version(name) for name in names}
+    seen = st.session_state.get(seen_key)
+    st.session_state[seen_key] = current
+    if seen is None or seen == current:
+        return False
+    return bool([key for key in keys if st.session_state.pop(key, None) is not None])
+
+
+def record_tab_timing(name, elapsed):
+    timings = st.session_state.setdefault('tab_timings', {})
+    timings.setdefault(name, deque(maxlen=TAB_TIMING_HISTORY)).append(elapsed)
+
+
+def tab_timing_report():
+    """(탭 이름, 실행 횟수, 마지막, 평균, p95) 목록. 시간은 ms."""
+    report = []
+    for name, timings in st.session_state.get('tab_timings', {}).items():
+        ordered = sorted(timings)
+        report.append((name, len(timings), timings[-1] * 1000, statistics.fmean(timings) * 1000,
+                       ordered[int(len(ordered) * 0.95)] * 1000))
+    return report
+
+
+def tab_fragment(name):
+    """탭 함수를 실행 시간을 재는 프래그먼트로 만든다. TAB_FRAGMENTS가 꺼져 있으면 시간만 잰다."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_tab_timing(name, time.perf_counter() - start)
+        return st.fragment(wrapper) if TAB_FRAGMENTS else wrapper
+    return decorator
@@ -1,5 +1,7 @@
 import streamlit as st
-import pandas as pd
+from row_selection import EMPTY_ROWS, as_row_ids, materialize_rows
+from tab_runtime import invalidate_on_change, publish, show_notice, tab_fragment
+from university_ranking import university_rank
 
 
 def sort_universities(df, sort_option, sort_order):
@@ -28,15 +30,18 @@ def order_by_ranking(df):
         st.warning("데이터프레임에 '대학명' 열이 없습니다.")
         return df
 
-    ranking = ['서울대학교', '연세대학교', '고려대학교', 'KAIST', 'POSTECH', '서강대학교', '성균관대학교', '한양대학교', '중앙대학교', '경희대학교', '한국외국어대학교',
-               '서울시립대학교', '건국대학교', '동국대학교', '홍익대학교', '국민대학교', '숭실대학교', '세종대학교', '단국대학교', 'DGIST', 'UNIST', 'GIST',
-               '이화여자대학교', '성신여자대학교', '숙명여자대학교', '광운대학교', '명지대학교', '상명대학교', '가천대학교', '가톨릭대학교']
-    df['ranking'] = df['대학명'].apply(lambda x: ranking.index(x) if x in ranking else len(ranking))
+    df['ranking'] = df['대학명'].map(university_rank)
     return df.sort_values('ranking').drop('ranking', axis=1)
 
 
+@tab_fragment('최종 필터링')
 def show_final_filtering():
     st.info("교과, 학종 필터링 결과를 조건에 따라 정렬하여 리스트별 최대 10개의 대학을 선정합니다.")
+    # 학생 정보나 저장된 교과/학종 결과가 바뀌면 그 결과로 만든 최종 리스트도 버린다 (보고서 탭은 같은 실행에서 이를 본다)
+    if invalidate_on_change('final_filtering',
+                            ['student_info', 'saved_subject_results', 'saved_comprehensive_results'],
+                            ['final_results', 'final_checked', 'final_selection']):
+        st.info("학생 정보나 저장된 필터링 결과가 바뀌어 이전 최종 리스트를 지웠습니다.")
 
     if 'saved_subject_results' not in st.session_state or 'saved_comprehensive_results' not in st.session_state:
         st.warning("교과 필터링과 학종 필터링을 먼저 완료해주세요.")
@@ -58,8 +63,8 @@ def show_final_filtering():
             list_name = list_names[list_type]
             emoji = list_emojis[list_type]
             st.write(f"**{emoji} {list_name} 리스트**")
-            if list_type in saved_results and not saved_results[list_type].empty:
-                df = order_by_ranking(saved_results[list_type])
+            if list_type in saved_results and len(saved_results[list_type]):
+                df = order_by_ranking(materialize_rows(saved_results[list_type]))
                 st.dataframe(df)
             else:
                 st.warning(f"{list_name} 데이터가 없습니다.")
@@ -71,8 +76,8 @@ def show_final_filtering():
             list_name = list_names[list_type]
             emoji = list_emojis[list_type]
             st.write(f"**{emoji} {list_name} 리스트**")
-            if list_type in saved_comprehensive_results and not saved_comprehensive_results[list_type].empty:
-                df = order_by_ranking(saved_comprehensive_results[list_type])
+            if list_type in saved_comprehensive_results and len(saved_comprehensive_results[list_type]):
+                df = order_by_ranking(materialize_rows(saved_comprehensive_results[list_type]))
                 st.dataframe(df)
             else:
                 st.warning(f"{list_name} 데이터가 없습니다.")
@@ -121,22 +126,24 @@ def show_final_filtering():
             for list_key in list_types:
                 list_type = list_type_map[list_key]
                 key = f"{admission_type}_{list_type}"
-                df = results.get(list_key, pd.DataFrame())
+                rows = results.get(list_key, EMPTY_ROWS)
 
-                if not df.empty:
+                if len(rows):
                     sort_option = st.session_state[f'{admission_type}_{list_key}_sort']
                     sort_order = st.session_state[f'{admission_type}_{list_key}_order']
-                    df = sort_universities(df, sort_option, sort_order)
-                    final_results[key] = df.head(10)
+                    df = sort_universities(materialize_rows(rows), sort_option, sort_order)
+                    # 정렬된 순서대로 상위 10개의 행 id만 저장한다
+                    final_results[key] = as_row_ids(df.head(10).index)
                 else:
                     st.warning(f"{admission_type} {list_type} 리스트에 데이터가 없습니다.")
 
         st.session_state['final_results'] = final_results
+        st.session_state['final_checked'] = dict(final_results)
         st.success("최종 필터링이 적용되었습니다.")
 
     if 'final_results' in st.session_state:
         st.subheader("최종 필터링 결과")
-        for i, (key, df) in enumerate(st.session_state['final_results'].items()):
+        for i, (key, rows) in enumerate(st.session_state['final_results'].items()):
             if i == 3:  # 교과 하향과 학종 상향 사이에 파선 추가
                 st.markdown("<hr style='border-top: 3px dashed #bbb;'>", unsafe_allow_html=True)
 
@@ -145,25 +152,27 @@ def show_final_filtering():
             list_emoji = list_emojis[reverse_list_names[list_type]]  # 여기를 수정했습니다
 
             st.write(f"**{emoji} {list_emoji} {admission_type}_{list_type}**")
+            df = materialize_rows(rows)
             df['선택'] = True  # 기본값을 선택된 상태로 설정
             edited_df = st.data_editor(df, hide_index=True, key=f"editor_{key}")
-            st.session_state['final_results'][key] = edited_df
+            st.session_state['final_checked'][key] = as_row_ids(edited_df.index[edited_df['선택']])
 
         if st.button("리스트 확정"):
             final_selection = {}
-            for key, df in st.session_state['final_results'].items():
-                selected_df = df[df['선택']]
-                if not selected_df.empty:
-                    final_selection[key] = selected_df
+            for key, rows in st.session_state['final_checked'].items():
+                if len(rows):
+                    final_selection[key] = rows
 
             if final_selection:
                 st.session_state['final_selection'] = final_selection
-                counts = {key: len(df) for key, df in final_selection.items()}
-                st.success(
+                counts = {key: len(rows) for key, rows in final_selection.items()}
+                publish(
+                    'final_selection',
                     f"교과 상향 {counts.get('교과_상향', 0)}개, 적정 {counts.get('교과_적정', 0)}개, 하향 {counts.get('교과_하향', 0)}개 / "
                     f"학종 상향 {counts.get('학종_상향', 0)}개, 적정 {counts.get('학종_적정', 0)}개, 하향 {counts.get('학종_하향', 0)}개 저장 완료되었습니다.")
             else:
                 st.warning("선택된 항목이 없습니다. 최소한 하나 이상의 항목을 선택해 주세요.")
+        show_notice('final_selection')
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 import streamlit as st
-from data_loader import lowest_ability_codes
-from data_loader import lowest_ability_codes, SCHOOL_TYPE_ADJUSTMENT
+from data_loader import get_lowest_ability_codes, SCHOOL_TYPE_ADJUSTMENT
+from tab_runtime import publish, show_notice, tab_fragment
 
 
+@tab_fragment('정보입력')
 def show_info_input():
     st.markdown(
         """
@@ -47,6 +48,7 @@ def show_info_input():
         adjusted_score = score
         st.write(f"입력한 성적: {score:.2f}")
 
+    lowest_ability_codes = get_lowest_ability_codes()
     lowest_ability = st.selectbox("📉 수능최저 역량을 선택하세요", list(lowest_ability_codes.keys()))
     lowest_ability_code = lowest_ability_codes[lowest_ability]
 
@@ -80,8 +82,10 @@ def show_info_input():
             'gender': gender,
             'admission_type': admission_type
         }
+        # 필터링/보고서 탭이 새 정보를 보도록 앱 전체를 다시 실행한다
+        publish('student_info', "아래와 같이 정보 입력이 완료되었습니다. 교과 필터링 탭으로 이동하세요.")
 
-        st.success("아래와 같이 정보 입력이 완료되었습니다. 교과 필터링 탭으로 이동하세요.")
+    if show_notice('student_info'):
         st.write(st.session_state['student_info'])
 
         st.markdown("""
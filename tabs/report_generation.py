@@ -1,31 +1,87 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
 import base64
-from openai import OpenAI
 import os
-from dotenv import load_dotenv
-import matplotlib.font_manager as fm
 import numpy as np
 import time
-from data_loader import expert_knowledge
-
-# 환경 변수 로드 및 OpenAI 클라이언트 설정
-load_dotenv()
-api_key = os.getenv('API_KEY')
-client = OpenAI(api_key=api_key)
-
-# 한글 폰트 설정
-font_path = 'KoPubDotumLight.ttf'
-font_prop = fm.FontProperties(fname=font_path)
-plt.rcParams['font.family'] = font_prop.get_name()
-plt.rcParams['font.size'] = 12
-plt.rcParams['axes.unicode_minus'] = False
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from charts import CHART_MIME_TYPES, CHART_OUTPUT_MODE, CHART_OUTPUT_MODES, TREND_CHARTS, chart_cache, \
+    submit_chart, trend_chart_spec
+from prompt_builder import PROMPT_TOKEN_BUDGET, assemble_prompt, compact_record, compact_table, estimate_tokens
+from data_loader import get_additional_data
+from llm_cache import get_llm_cache, llm_cache_key
+from llm_client import get_llm_client
+from report_jobs import ACTIVE_STATUSES, get_report_job_runner
+from row_selection import EMPTY_ROWS, materialize_rows
+from tab_runtime import tab_fragment
+
+# 환경 변수(.env)는 main.py가 가장 먼저 읽는다. OpenAI SDK는 llm_client가 첫 호출 때 불러온다
+
+# 보고서 한 건에서 동시에 보낼 GPT 요청 수와 요청별 제한 시간(초)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_CALL_TIMEOUT = float(os.getenv('LLM_CALL_TIMEOUT', '60'))
+LLM_FAILURE_MESSAGE = "(AI 분석을 생성하지 못했습니다. 잠시 후 다시 시도해 주세요.)"
+PROGRESS_POLL_INTERVAL = 0.25
+# 같은 프롬프트의 GPT 응답을 디스크 캐시(llm_cache)에서 재사용할지 여부
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+
+
+class ReportProgress:
+    """보고서 생성 단계(전처리, 차트, GPT 호출, 표)의 완료 이벤트를 모아 진행률로 알린다.
+
+    step()은 어느 스레드에서나 부를 수 있고, on_update(비율, 단계 이름, 단계 소요 시간, 누적 시간)는
+    이 객체를 만든 스레드(Streamlit 스크립트 스레드)에서 flush()할 때만 호출된다.
+    """
 
-# Seaborn 스타일 설정
-sns.set_theme(style="whitegrid", palette="pastel")
+    def __init__(self, total_steps=0, on_update=None):
+        self.total_steps = total_steps
+        self.completed = 0
+        self.total_elapsed = 0.0
+        self.stages = []
+        self.prompt_tokens = []
+        self._on_update = on_update
+        self._pending = []
+        self._lock = threading.Lock()
+        self._owner = threading.get_ident()
+        self._started = self._last = time.perf_counter()
+
+    def expect(self, steps):
+        self.total_steps += steps
+
+    def step(self, name, elapsed=None):
+        with self._lock:
+            now = time.perf_counter()
+            if elapsed is None:
+                elapsed = now - self._last
+            self._last = now
+            self.completed += 1
+            self.total_elapsed = now - self._started
+            self.stages.append((name, elapsed))
+            self._pending.append((self.completed, name, elapsed, self.total_elapsed))
+        if threading.get_ident() == self._owner:
+            self.flush()
+
+    def note_prompt(self, name, tokens):
+        with self._lock:
+            self.prompt_tokens.append((name, tokens))
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if self._on_update is None:
+            return
+        for completed, name, elapsed, total_elapsed in pending:
+            fraction = min(completed / max(self.total_steps, 1), 1.0)
+            self._on_update(fraction, name, elapsed, total_elapsed)
+
+
+def report_step_count(high_info):
+    """generate_report가 알리는 단계 수: 심층 분석 학과마다 차트 3개와 GPT 1회, 공통 GPT 2회와 표 1개."""
+    programs = (min(len(high_info[high_info['전형구분'] == '교과']), 3) +
+                min(len(high_info[high_info['전형구분'] == '종합']), 3))
+    return programs * 4 + 3
 
 
 # 여기에 format_value 함수를 추가
@@ -59,39 +115,52 @@ needed_columns = [
 ]
 
 
-def generate_overall_opinion_prompt(student_info, university_list):
-    prompt = f"""
-    다음 전문지식과 학생 정보, 지원 가능 대학 목록을 참고하여 학생의 대학 지원에 대한 전략적이고 간결한 종합 의견을 제시해주세요.
-
-    전문지식:
-    {expert_knowledge}
-
-    학생 정보:
-    {student_info}
+# 프롬프트별로 넘기는 필드. 보고서에 쓰는 needed_columns 중 GPT 분석에 필요한 것만 고른다
+STUDENT_PROMPT_FIELDS = {
+    'school_type': '학교유형', 'field': '계열', 'detail_fields': '희망계열', 'major_interest': '관심전공',
+    'score': '내신성적', 'adjusted_score': '보정 내신', 'lowest_ability': '수능최저역량',
+    'non_subject_level': '비교과 활동수준', 'major_subjects_strong': '주요과목 우수', 'admission_type': '지원 전형',
+}
+PROGRAM_KEY_FIELDS = ['대학명', '모집단위', '전형구분', '전형명']
+OVERALL_OPINION_FIELDS = ['구분'] + PROGRAM_KEY_FIELDS[:3] + [
+    '3개년_경쟁률_평균', '3개년_입결70%_평균', '3개년_충원율_평균',
+]
+TREND_FIELDS = [
+    '2025년_모집인원', '2024년_모집인원', '전년대비2025년_모집인원변화',
+    '2024년_경쟁률', '2023년_경쟁률', '2022년_경쟁률',
+    '2024년_입결70%', '2023년_입결70%', '2022년_입결70%',
+    '2024년_입결50%', '2023년_입결50%', '2022년_입결50%',
+    '2024년_충원율(%)', '2023년_충원율(%)', '2022년_충원율(%)',
+    '2025년_최저요약', '2024년_수능최저',
+]
+TOP_3_FIELDS = PROGRAM_KEY_FIELDS + TREND_FIELDS
+DETAILED_ANALYSIS_FIELDS = ['계열상세명'] + TREND_FIELDS + [
+    '2024년_경쟁률변동(%)', '2024년_입결70%변동(%)', '2024년_충원율변동(%)',
+    '2024년_계열경쟁률', '2024년_계열입결70%', '2024년_계열충원율(%)',
+    '3개년_계열경쟁률_평균', '3개년_계열입결70%_평균', '3개년_계열충원율_평균',
+]
 
-    지원 가능 대학 목록:
-    {university_list}
 
-    요구사항:
+def generate_overall_opinion_prompt(student_info, programs):
+    """programs는 '구분'(상향/적정/하향) 열이 붙은 지원 가능 대학 목록이다."""
+    student = {label: student_info[key] for key, label in STUDENT_PROMPT_FIELDS.items() if key in student_info}
+    return assemble_prompt(
+        "위 전문지식과 아래 학생 정보, 지원 가능 대학 목록을 참고하여 학생의 대학 지원에 대한 전략적이고 간결한 종합 의견을 제시해주세요.",
+        [compact_record("학생 정보", student, list(student)),
+         compact_table("지원 가능 대학 목록", programs, OVERALL_OPINION_FIELDS)],
+        """
     1. 학생의 현재 성적과 목표 대학 간의 격차를 분석하세요.
     2. 상향, 적정, 하향 지원의 균형을 제안하되, 각 카테고리별로 1-2개 대학을 추천하세요.
     3. 추천 대학의 3개년 입시 결과(경쟁률, 입결, 충원율)를 간략히 언급하고, 주기적 변동 가능성을 고려하세요.
     4. 200단어 이내로 작성하세요.
-    """
-    return prompt
+    """)
 
 
 def generate_top_3_recommendations_prompt(university_data):
-    prompt = f"""
-    다음 전문지식과 상향 지원 대상 대학 정보를 참고하여 상향 지원 BEST 3에 대한 간결하고 전략적인 분석을 제공해주세요. 전문지식을 참고하여 작성하세요.
-
-    전문지식:
-    {expert_knowledge}
-
-    상향 지원 대상 대학 정보:
-    {university_data}
-
-    요구사항:
+    return assemble_prompt(
+        "위 전문지식과 아래 상향 지원 대상 대학 정보를 참고하여 상향 지원 BEST 3에 대한 간결하고 전략적인 분석을 제공해주세요. 전문지식을 참고하여 작성하세요.",
+        [compact_table("상향 지원 대상 대학 정보", university_data, TOP_3_FIELDS)],
+        """
     1. 교과 전형과 학생부 종합 전형을 구분하여 분석하세요.
     2. 각 전형별로 3개 대학/학과에 대해 분석하세요.
     3. 각 대학/학과의 3개년 경쟁률, 입결, 충원율 추이를 요약하고, 주기적 변동 패턴이 있는지 분석하세요.
@@ -110,24 +179,15 @@ def generate_top_3_recommendations_prompt(university_data):
        1. 대학명 학과명: 분석 내용
        2. 대학명 학과명: 분석 내용
        3. 대학명 학과명: 분석 내용
-    """
-    return prompt
+    """)
 
 
 def generate_detailed_analysis_prompt(university_info, admission_data):
-    prompt = f"""
-    다음 전문지식과 대학/학과 정보와 입시 데이터를 참고하여 상세 분석 보고서를 작성해 주세요. 전문지식을 참고하여 작성하세요.
-
-    전문지식:
-    {expert_knowledge}
-
-    대학/학과 정보:
-    {university_info}
-
-    입시 데이터:
-    {admission_data}
-
-    요구사항:
+    """admission_data는 학과 한 행(dict 또는 Series)이다. university_info에 적은 필드는 다시 넣지 않는다."""
+    return assemble_prompt(
+        f"위 전문지식과 아래 입시 데이터를 참고하여 {university_info}의 상세 분석 보고서를 작성해 주세요. 전문지식을 참고하여 작성하세요.",
+        [compact_record("입시 데이터", admission_data, DETAILED_ANALYSIS_FIELDS)],
+        """
     1. 3개년 데이터를 바탕으로 경쟁률, 입결, 충원율의 추이를 분석하고, 주기적 변동 패턴이 있는지 확인하세요.
     2. 경쟁률이 6대 1 이하이거나 10대 1 이상인 경우, 그 의미를 분석하고 다음 해 변동 가능성을 예측하세요.
     3. 모집인원 변화가 40% 이상인 경우, 그 영향을 설명하세요.
@@ -136,184 +196,364 @@ def generate_detailed_analysis_prompt(university_info, admission_data):
     6. 학과의 선호도 변화 가능성(예: 경영학, 교육학, 행정학 등)을 고려하여 분석하세요.
     7. 주기적 변동성을 고려한 의견도 포함하세요.
     8. 이 모든 것을 한 문단으로, 300단어 이내로 작성하세요.
+    """)
+
+
+GPT_MODEL = "gpt-4o-mini"
+GPT_SYSTEM_MESSAGE = "You are a helpful assistant that generates reports based on university admission data. Please refer to the expert knowledge provided in the prompt when answering. Answer in Korean."
+GPT_MAX_TOKENS = 1000
+STREAM_RENDER_INTERVAL = 0.1
+
+
+def build_gpt_messages(prompt):
+    return [
+        {"role": "system", "content": GPT_SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def gpt_cache_key(prompt):
+    return llm_cache_key(GPT_MODEL, GPT_SYSTEM_MESSAGE, prompt, GPT_MAX_TOKENS)
+
+
+def cached_gpt_response(prompt):
+    """캐시된 응답과 캐시 객체를 반환한다. 캐시를 쓰지 않으면 (None, None)."""
+    if not LLM_CACHE_ENABLED:
+        return None, None
+    cache = get_llm_cache()
+    return cache.get(gpt_cache_key(prompt)), cache
+
+
+def generate_gpt_response(prompt, timeout=LLM_CALL_TIMEOUT):
+    cached, cache = cached_gpt_response(prompt)
+    if cached is not None:
+        return cached
+    text = get_llm_client().complete(build_gpt_messages(prompt), GPT_MODEL, GPT_MAX_TOKENS, timeout).strip()
+    if cache is not None:
+        cache.put(gpt_cache_key(prompt), text)
+    return text
+
+
+def stream_gpt_response(prompt, timeout=LLM_CALL_TIMEOUT):
+    """generate_gpt_response의 스트리밍 버전. 응답 텍스트 조각을 도착하는 대로 내준다.
+
+    캐시에 있는 응답은 한 조각으로 바로 내주고, 끝까지 받은 응답만 캐시에 저장한다.
     """
-    return prompt
+    cached, cache = cached_gpt_response(prompt)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    for chunk in get_llm_client().stream(build_gpt_messages(prompt), GPT_MODEL, GPT_MAX_TOKENS, timeout):
+        parts.append(chunk)
+        yield chunk
+    if cache is not None:
+        cache.put(gpt_cache_key(prompt), "".join(parts).strip())
+
 
+class GPTStream:
+    """백그라운드에서 받는 스트리밍 GPT 응답.
 
-def generate_gpt_response(prompt):
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system",
-             "content": "You are a helpful assistant that generates reports based on university admission data. Please refer to the expert knowledge provided in the prompt when answering. Answer in Korean."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=1000
-    )
-    return response.choices[0].message.content.strip()
+    run()은 executor 스레드에서 응답 조각을 모으고, 스크립트 스레드는 chunks()로 도착한 조각을
+    순서대로 받거나 result()로 전체 응답을 기다린다. 제한 시간 초과나 API 오류는 안내 문구로 대신한다.
+    응답 도중 연결이 끊기거나(httpx 오류는 SDK가 감싸지 않는다) 캐시 저장이 실패해도 실패로 처리하고,
+    받다 만 응답은 성공한 구간으로 보여 주지 않는다.
+    """
 
+    def __init__(self, prompt, timeout=LLM_CALL_TIMEOUT, progress=None, label="GPT 요청"):
+        self.prompt = prompt
+        self.timeout = timeout
+        self.progress = progress
+        self.label = label
+        self._chunks = []
+        self._done = False
+        self._failed = False
+        self.error = None
+        self._condition = threading.Condition()
+        self._submitted = time.perf_counter()
+
+    def run(self):
+        try:
+            for chunk in stream_gpt_response(self.prompt, self.timeout):
+                with self._condition:
+                    self._chunks.append(chunk)
+                    self._condition.notify_all()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self._failed = True
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+            if self.progress is not None:
+                self.progress.step(self.label, time.perf_counter() - self._submitted)
+
+    def chunks(self):
+        # 대기열에서 기다린 시간까지 고려해 요청 제한 시간보다 조금 더 기다린다
+        deadline = time.monotonic() + self.timeout * 2
+        position = 0
+        while True:
+            with self._condition:
+                if position == len(self._chunks) and not self._done:
+                    self._condition.wait(PROGRESS_POLL_INTERVAL)
+                new_chunks = self._chunks[position:]
+                done = self._done
+            position += len(new_chunks)
+            yield from new_chunks
+            if done:
+                return
+            # 기다리는 동안 다른 단계의 완료 이벤트를 진행률에 반영한다
+            if self.progress is not None:
+                self.progress.flush()
+            if time.monotonic() >= deadline:
+                self._failed = True
+                return
+
+    def result(self):
+        for _ in self.chunks():
+            pass
+        if self._failed:
+            return LLM_FAILURE_MESSAGE
+        return "".join(self._chunks).strip()
+
+
+def start_gpt_streams(executor, prompts, timeout=LLM_CALL_TIMEOUT, progress=None, labels=None):
+    """서로 독립적인 GPT 요청들을 executor에서 한꺼번에 시작한다. 결과는 prompts 순서의 GPTStream 목록이다."""
+    streams = []
+    for i, prompt in enumerate(prompts):
+        stream = GPTStream(prompt, timeout, progress, labels[i] if labels else f"GPT 요청 {i + 1}")
+        if progress is not None:
+            progress.note_prompt(stream.label, estimate_tokens(prompt))
+        executor.submit(stream.run)
+        streams.append(stream)
+    return streams
+
+
+# GPT 응답이 들어갈 보고서 구간. render(응답 텍스트)가 구간의 마크다운을 만든다
+GPTSection = namedtuple('GPTSection', ['stream', 'render'])
+# 차트 구간. PNG는 원본 바이트를 st.image로 보내 미디어 파일로 전송되고, 마크다운에는 data URI로 들어간다.
+# SVG는 base64로 감싸지 않고 마크업을 그대로 페이지(마크다운)에 넣는다
+ChartSection = namedtuple('ChartSection', ['metric', 'spec', 'image', 'image_format'])
+
+
+def image_data_uri(image, image_format):
+    return f"data:{CHART_MIME_TYPES[image_format]};base64,{base64.b64encode(image).decode()}"
+
+
+def inline_svg_markup(image, caption):
+    """SVG 바이트를 마크다운에 바로 넣을 수 있는 <figure> 마크업으로 만든다. XML 선언과 DOCTYPE은 뺀다."""
+    svg = image.decode('utf-8')
+    svg = svg[svg.index('<svg'):].replace('<svg ', '<svg style="max-width: 100%; height: auto" ', 1)
+    return f'<figure style="text-align: center">\n{svg}<figcaption>{caption}</figcaption>\n</figure>\n\n'
+
+
+def section_markdown(section):
+    """보고서 구간(문자열, GPTSection, ChartSection)의 완성된 마크다운."""
+    if isinstance(section, GPTSection):
+        return section.render(section.stream.result())
+    if isinstance(section, ChartSection):
+        name = TREND_CHARTS[section.metric]['name']
+        if section.image_format == 'svg':
+            return inline_svg_markup(section.image, name)
+        return f"![{name}]({image_data_uri(section.image, section.image_format)})\n\n"
+    return section
+
+
+def print_report_markdown(sections):
+    """이미 받은 구간들로 인쇄용 마크다운을 만든다. 차트만 print 모드(300dpi PNG)로 다시 받아 넣는다."""
+    dpi, image_format = CHART_OUTPUT_MODES['print']
+    futures = [submit_chart(section.spec, dpi, image_format) if isinstance(section, ChartSection) else None
+               for section in sections]
+    report = ""
+    for section, future in zip(sections, futures):
+        if future is not None:
+            section = section._replace(image=future.result(), image_format=image_format)
+        report += section_markdown(section)
+    return report
 
-def analyze_university(row, all_data, index, admission_type):
-    report = f"### {index}. {row['대학명']} {row['모집단위']} - {admission_type} 전형\n\n"
 
-    # 경쟁률 분석
-    report += "#### 경쟁률 분석\n\n"
-    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 5))
+def render_report_section(section):
+    """구간 하나를 자기 자리표시자에 그린다. GPT 구간은 응답 조각이 도착하는 대로 갱신한다."""
+    placeholder = st.empty()
+    if isinstance(section, ChartSection):
+        if section.image_format == 'svg':
+            placeholder.markdown(section_markdown(section), unsafe_allow_html=True)
+        else:
+            placeholder.image(section.image, caption=TREND_CHARTS[section.metric]['name'], use_container_width=True)
+        return
+    if isinstance(section, GPTSection):
+        text = ""
+        last_render = 0.0
+        for chunk in section.stream.chunks():
+            text += chunk
+            if time.perf_counter() - last_render >= STREAM_RENDER_INTERVAL:
+                placeholder.markdown(section.render(text) + "▌", unsafe_allow_html=True)
+                last_render = time.perf_counter()
+    placeholder.markdown(section_markdown(section), unsafe_allow_html=True)
+
+
+def generate_university_analysis_prompt(row, admission_type):
+    university_info = f"{row['대학명']} {row['전형명']} {row['모집단위']}({admission_type} 전형)"
+    return generate_detailed_analysis_prompt(university_info, row)
+
 
-    years = ['2022년', '2023년', '2024년']
-    competition_rates = [row['2022년_경쟁률'], row['2023년_경쟁률'], row['2024년_경쟁률']]
-    series_rates = [row['2022년_계열경쟁률'], row['2023년_계열경쟁률'], row['2024년_계열경쟁률']]
+def analyze_university(row, all_data, index, admission_type, gpt_insight_response=None, progress=None,
+                       chart_mode='print'):
+    # GPT를 활용한 종합 분석 및 인사이트 생성 (미리 요청해 둔 응답이 없으면 여기서 요청)
+    if gpt_insight_response is None:
+        gpt_insight_prompt = generate_university_analysis_prompt(row, admission_type)
+        gpt_insight_response = generate_gpt_response(gpt_insight_prompt)
+    sections = university_analysis_sections(row, index, admission_type, gpt_insight_response, progress,
+                                            chart_mode=chart_mode)
+    return "".join(section_markdown(section) for section in sections)
 
-    ax1.plot(years, competition_rates, marker='o', label='모집단위')
-    ax1.plot(years, series_rates, marker='o', linestyle='--', label='계열평균')
-    ax1.set_title('3개년 경쟁률 추이', fontproperties=font_prop)
-    ax1.set_ylabel('경쟁률', fontproperties=font_prop)
-    ax1.legend(prop=font_prop)
 
-    labels = ['2024년 경쟁률', '3개년 평균']
-    unit_values = [row['2024년_경쟁률'], row['3개년_경쟁률_평균']]
-    series_values = [row['2024년_계열경쟁률'], row['3개년_계열경쟁률_평균']]
+CHART_METRICS = ('경쟁률', '입결', '충원율')
 
-    x = np.arange(len(labels))
-    width = 0.35
 
-    ax2.bar(x - width / 2, unit_values, width, label='모집단위')
-    ax2.bar(x + width / 2, series_values, width, label='계열평균')
-    ax2.set_title('2024년 vs 3개년 평균 경쟁률', fontproperties=font_prop)
-    ax2.set_xticks(x)
-    ax2.set_xticklabels(labels, fontproperties=font_prop)
-    ax2.legend(prop=font_prop)
+def submit_program_charts(row, chart_mode=CHART_OUTPUT_MODE):
+    """학과 한 행의 경쟁률/입결/충원율 차트를 렌더링 풀에 넣는다. 지표별 (ChartSpec, 형식, 이미지 Future)를 반환한다."""
+    dpi, image_format = CHART_OUTPUT_MODES[chart_mode]
+    charts = {}
+    for metric in CHART_METRICS:
+        spec = trend_chart_spec(row, metric)
+        charts[metric] = (spec, image_format, submit_chart(spec, dpi, image_format))
+    return charts
 
-    labels = ['모집단위', '계열평균']
-    values = [row['2024년_경쟁률변동(%)'], row['2024년_계열경쟁률변동(%)']]
 
-    ax3.bar(labels, values)
-    ax3.set_title('2024년 경쟁률 변동(%)', fontproperties=font_prop)
-    ax3.set_ylabel('변동률 (%)', fontproperties=font_prop)
+def chart_section(charts, metric):
+    spec, image_format, future = charts[metric]
+    return ChartSection(metric, spec, future.result(), image_format)
 
-    plt.tight_layout()
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
 
-    report += f"![Competition Rate Analysis](data:image/png;base64,{image_base64})\n\n"
+def university_analysis_sections(row, index, admission_type, gpt_insight, progress=None, charts=None,
+                                 chart_mode=CHART_OUTPUT_MODE):
+    """학과 하나의 심층 분석 구간들을 차례로 내준다.
+
+    gpt_insight는 응답 문자열이나 GPTStream이고, charts는 submit_program_charts로 미리 넣어 둔 차트다.
+    """
+    if charts is None:
+        charts = submit_program_charts(row, chart_mode)
+    report = f"### {index}. {row['대학명']} {row['모집단위']} - {admission_type} 전형\n\n"
+    program_name = f"{row['대학명']} {row['모집단위']}"
+
+    # 경쟁률 분석
+    report += "#### 경쟁률 분석\n\n"
+    yield report
+    yield chart_section(charts, '경쟁률')
+    if progress is not None:
+        progress.step(f"경쟁률 차트: {program_name}")
 
-    report += f"- 2024학년도 경쟁률: {format_value(row['2024년_경쟁률'])} (계열 평균: {format_value(row['2024년_계열경쟁률'])})\n"
+    report = f"- 2024학년도 경쟁률: {format_value(row['2024년_경쟁률'])} (계열 평균: {format_value(row['2024년_계열경쟁률'])})\n"
     report += f"- 2024학년도 경쟁률 변동(%): {format_value(row['2024년_경쟁률변동(%)'])} (계열 평균: {format_value(row['2024년_계열경쟁률변동(%)'])})\n"
     report += f"- 3개년 평균 경쟁률: {format_value(row['3개년_경쟁률_평균'])} (계열 평균: {format_value(row['3개년_계열경쟁률_평균'])})\n\n"
 
+    yield report
+
     # 입결 분석
-    report += "#### 입결 분석\n\n"
-    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 5))
-
-    entrance_scores = [row['2022년_입결70%'], row['2023년_입결70%'], row['2024년_입결70%']]
-    series_scores = [row['2022년_계열입결70%'], row['2023년_계열입결70%'], row['2024년_계열입결70%']]
-
-    ax1.plot(years, entrance_scores, marker='o', label='모집단위')
-    ax1.plot(years, series_scores, marker='o', linestyle='--', label='계열평균')
-    ax1.set_title('3개년 입결 70% 추이', fontproperties=font_prop)
-    ax1.set_ylabel('입결 70%', fontproperties=font_prop)
-    ax1.legend(prop=font_prop)
-
-    labels = ['2024년 입결 70%', '3개년 평균']
-    unit_values = [row['2024년_입결70%'], row['3개년_입결70%_평균']]
-    series_values = [row['2024년_계열입결70%'], row['3개년_계열입결70%_평균']]
-
-    ax2.bar(x - width / 2, unit_values, width, label='모집단위')
-    ax2.bar(x + width / 2, series_values, width, label='계열평균')
-    ax2.set_title('2024년 vs 3개년 평균 입결 70%', fontproperties=font_prop)
-    ax2.set_xticks(x)
-    ax2.set_xticklabels(labels, fontproperties=font_prop)
-    ax2.legend(prop=font_prop)
-
-    labels = ['모집단위', '계열평균']
-    values = [row['2024년_입결70%변동(%)'], row['2024년_계열입결70%변동(%)']]
-
-    ax3.bar(labels, values)
-    ax3.set_title('2024년 입결 70% 변동(%)', fontproperties=font_prop)
-    ax3.set_ylabel('변동률 (%)', fontproperties=font_prop)
-
-    plt.tight_layout()
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-
-    report += f"![Entrance Score Analysis](data:image/png;base64,{image_base64})\n\n"
-
-    report += f"- 2024학년도 70% 입결: {format_value(row['2024년_입결70%'])} (계열 평균: {format_value(row['2024년_계열입결70%'])})\n"
+    report = "#### 입결 분석\n\n"
+    yield report
+    yield chart_section(charts, '입결')
+    if progress is not None:
+        progress.step(f"입결 차트: {program_name}")
+
+    report = f"- 2024학년도 70% 입결: {format_value(row['2024년_입결70%'])} (계열 평균: {format_value(row['2024년_계열입결70%'])})\n"
     report += f"- 2024학년도 70% 입결 변동(%): {format_value(row['2024년_입결70%변동(%)'])} (계열 평균: {format_value(row['2024년_계열입결70%변동(%)'])})\n"
     report += f"- 3개년 평균 70% 입결: {format_value(row['3개년_입결70%_평균'])} (계열 평균: {format_value(row['3개년_계열입결70%_평균'])})\n\n"
 
+    yield report
+
     # 충원율 분석
-    report += "#### 충원율 분석\n\n"
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
-
-    fill_rates = [row['2022년_충원율(%)'], row['2023년_충원율(%)'], row['2024년_충원율(%)']]
-    series_fill_rates = [row['2022년_계열충원율(%)'], row['2023년_계열충원율(%)'], row['2024년_계열충원율(%)']]
-
-    ax1.plot(years, fill_rates, marker='o', label='모집단위')
-    ax1.plot(years, series_fill_rates, marker='o', linestyle='--', label='계열평균')
-    ax1.set_title('3개년 충원율 추이', fontproperties=font_prop)
-    ax1.set_ylabel('충원율 (%)', fontproperties=font_prop)
-    ax1.legend(prop=font_prop)
-
-    labels = ['2024년 충원율', '3개년 평균']
-    unit_values = [row['2024년_충원율(%)'], row['3개년_충원율_평균']]
-    series_values = [row['2024년_계열충원율(%)'], row['3개년_계열충원율_평균']]
-
-    ax2.bar(x - width / 2, unit_values, width, label='모집단위')
-    ax2.bar(x + width / 2, series_values, width, label='계열평균')
-    ax2.set_title('2024년 vs 3개년 평균 충원율', fontproperties=font_prop)
-    ax2.set_xticks(x)
-    ax2.set_xticklabels(labels, fontproperties=font_prop)
-    ax2.legend(prop=font_prop)
-
-    plt.tight_layout()
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-
-    report += f"![Fill Rate Analysis](data:image/png;base64,{image_base64})\n\n"
-
-    report += f"- 2024학년도 충원율: {format_value(row['2024년_충원율(%)'])}% (계열 평균: {format_value(row['2024년_계열충원율(%)'])}%)\n"
+    report = "#### 충원율 분석\n\n"
+    yield report
+    yield chart_section(charts, '충원율')
+    if progress is not None:
+        progress.step(f"충원율 차트: {program_name}")
+
+    report = f"- 2024학년도 충원율: {format_value(row['2024년_충원율(%)'])}% (계열 평균: {format_value(row['2024년_계열충원율(%)'])}%)\n"
     report += f"- 2024학년도 충원율 변동(%): {format_value(row['2024년_충원율변동(%)'])} (계열 평균: {format_value(row['2024년_계열충원율변동(%)'])})\n"
     report += f"- 3개년 평균 충원율: {format_value(row['3개년_충원율_평균'])}% (계열 평균: {format_value(row['3개년_계열충원율_평균'])}%)\n\n"
 
+    yield report
+
     # 심층 분석
-    report += "#### 심층 분석\n\n"
+    yield "#### 심층 분석\n\n"
+    if isinstance(gpt_insight, GPTStream):
+        yield GPTSection(gpt_insight, lambda text: f"{text}\n\n")
+    else:
+        yield f"{gpt_insight}\n\n"
 
-    # GPT를 활용한 종합 분석 및 인사이트 생성
-    university_info = f"{row['대학명']} {row['모집단위']} {admission_type} 전형"
-    admission_data = row.to_dict()
-    gpt_insight_prompt = generate_detailed_analysis_prompt(university_info, admission_data)
-    gpt_insight_response = generate_gpt_response(gpt_insight_prompt)
-    report += f"{gpt_insight_response}\n\n"
+    yield "---\n\n"
 
-    report += "---\n\n"
 
-    return report
+def tiered_programs(high_info, mid_info, low_info):
+    """상향/적정/하향 목록을 '구분' 열을 붙여 하나로 합친다."""
+    return pd.concat([df.assign(구분=level) for level, df in [('상향', high_info), ('적정', mid_info),
+                                                            ('하향', low_info)]],
+                     ignore_index=True)
 
 
-def generate_university_list(high_info, mid_info, low_info):
-    university_list = ""
-    for level, df in [('상향', high_info), ('적정', mid_info), ('하향', low_info)]:
-        university_list += f"{level}:\n"
-        for _, row in df.iterrows():
-            university_list += f"- {row['대학명']} {row['모집단위']} ({row['전형구분']})\n"
-    return university_list
+def generate_report(high_info, mid_info, low_info, student_info, all_data, addtional_data, progress=None,
+                    chart_mode='print'):
+    """보고서 전체를 마크다운 한 덩어리로 만든다. 차트가 data URI로 들어가므로 기본값은 인쇄용 모드다."""
+    sections = generate_report_sections(high_info, mid_info, low_info, student_info, all_data, addtional_data,
+                                        progress, chart_mode)
+    report = "".join(section_markdown(section) for section in sections)
+
+    tables = generate_detailed_tables(high_info, mid_info, low_info)
+    if progress is not None:
+        progress.step("지원 가능안 상세 표")
+        progress.flush()
+
+    return report, tables
 
 
-def generate_report(high_info, mid_info, low_info, student_info, all_data, addtional_data):
-    report = ""
+def format_top_3_response(gpt_strategy_response):
+    # GPT 응답을 교과와 종합으로 분리
+    edu_curriculum, _, comprehensive = gpt_strategy_response.partition('[학생부 종합 전형]')
+
+    report = "#### 교과 전형\n\n"
+    report += edu_curriculum.replace('[교과 전형]', '').strip() + "\n\n"
+
+    report += "#### 학생부 종합 전형\n\n"
+    report += comprehensive.strip() + "\n\n"
+    return report
+
+
+def generate_report_sections(high_info, mid_info, low_info, student_info, all_data, addtional_data, progress=None,
+                             chart_mode=CHART_OUTPUT_MODE):
+    """보고서를 구간 단위로 내주는 제너레이터. 구간은 마크다운 문자열이거나 GPT 응답이 스트리밍되는 GPTSection이다.
+
+    서로 독립적인 GPT 요청(종합 의견, 상향 BEST 3, 학과별 심층 분석)을 먼저 동시에 시작해 두고,
+    응답을 기다리는 동안 표와 차트를 만든다. 응답은 원래 순서대로 보고서에 들어간다.
+    """
+    high_subject_info = high_info[high_info['전형구분'] == '교과'].head(3)
+    high_comprehensive_info = high_info[high_info['전형구분'] == '종합'].head(3)
+
+    prompts = [
+        generate_overall_opinion_prompt(student_info, tiered_programs(high_info, mid_info, low_info)),
+        generate_top_3_recommendations_prompt(high_info),
+    ]
+    prompts += [generate_university_analysis_prompt(row, '교과') for _, row in high_subject_info.iterrows()]
+    prompts += [generate_university_analysis_prompt(row, '학종') for _, row in high_comprehensive_info.iterrows()]
+
+    labels = ["GPT 종합 의견", "GPT 상향 지원 BEST 3"]
+    labels += [f"GPT 심층 분석: {row['대학명']} {row['모집단위']}" for _, row in high_subject_info.iterrows()]
+    labels += [f"GPT 심층 분석: {row['대학명']} {row['모집단위']}" for _, row in high_comprehensive_info.iterrows()]
+
+    executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY)
+    streams = start_gpt_streams(executor, prompts, progress=progress, labels=labels)
+    overall_stream, strategy_stream = streams[:2]
+    subject_streams = streams[2:2 + len(high_subject_info)]
+    comprehensive_streams = streams[2 + len(high_subject_info):]
+    executor.shutdown(wait=False)
+
+    # 심층 분석 차트도 미리 렌더링 풀에 넣어 GPT 응답을 기다리는 동안 그린다
+    subject_charts = [submit_program_charts(row, chart_mode) for _, row in high_subject_info.iterrows()]
+    comprehensive_charts = [submit_program_charts(row, chart_mode) for _, row in high_comprehensive_info.iterrows()]
 
     # 기본 정보
-    report += "### 기본 정보 🏫\n\n"
+    report = "### 기본 정보 🏫\n\n"
     basic_info = pd.DataFrame([
         {'학교유형': student_info['school_type'],
          '계열(인문/자연)': ', '.join(student_info['field']),
@@ -324,9 +564,10 @@ def generate_report(high_info, mid_info, low_info, student_info, all_data, addti
          '주요과목 우수': 'Yes' if student_info['major_subjects_strong'] == 'YES' else 'No'}
     ])
     report += basic_info.to_markdown(index=False) + "\n\n"
+    yield report
 
     # 지원 가능선
-    report += "### 지원 가능선 🎯\n\n"
+    report = "### 지원 가능선 🎯\n\n"
     report += "| | 교과 | 학생부 종합 |\n"
     report += "|------|------|-------------|\n"
 
@@ -349,15 +590,14 @@ def generate_report(high_info, mid_info, low_info, student_info, all_data, addti
             report += " | "
         report += "\n"
 
+    yield report
+
     # 종합 의견 (GPT로 작성)
-    university_list = generate_university_list(high_info, mid_info, low_info)
-    gpt_prompt = generate_overall_opinion_prompt(student_info, university_list)
-    gpt_response = generate_gpt_response(gpt_prompt)
-    report += f"### 종합 의견 📝\n\n{gpt_response}\n\n"
-    report += "---\n\n"
+    yield GPTSection(overall_stream, lambda gpt_response: f"### 종합 의견 📝\n\n{gpt_response}\n\n")
+    yield "---\n\n"
 
     # 상향 지원 BEST 3
-    report += "### 상향 지원 BEST 3 🌟\n"
+    report = "### 상향 지원 BEST 3 🌟\n"
     best_3_text = """
     경쟁률과 입결은 해마다 변동성이 큰 지표이며 상승과 하락을 반복하는 경향이 있지만, 장기적으로 볼 때 각 학과별로 어느 정도 일정한 추세를 보입니다. 반면 충원율의 경우에는 학과마다 비교적 안정적인 경향성을 나타내고 있습니다.
 
@@ -368,37 +608,24 @@ def generate_report(high_info, mid_info, low_info, student_info, all_data, addti
     best_3_html = best_3_text.replace('\n', '<br>')
     report += f"<div style='background-color: rgba(0, 0, 0, 0.05); padding: 10px; border-radius: 5px;'>{best_3_html}</div>\n\n"
     report += "\n"
+    yield report
 
     # GPT로 상향지원전략 작성 (교과와 종합 모두 포함)
-    gpt_strategy_prompt = generate_top_3_recommendations_prompt(high_info.to_dict('records'))
-    gpt_strategy_response = generate_gpt_response(gpt_strategy_prompt)
-
-    # GPT 응답을 교과와 종합으로 분리
-    edu_curriculum, comprehensive = gpt_strategy_response.split('[학생부 종합 전형]')
+    yield GPTSection(strategy_stream, format_top_3_response)
 
-    report += "#### 교과 전형\n\n"
-    report += edu_curriculum.replace('[교과 전형]', '').strip() + "\n\n"
-
-    report += "#### 학생부 종합 전형\n\n"
-    report += comprehensive.strip() + "\n\n"
-
-    report += "---\n\n"
-
-    report += "각 상향지원 안에 대해 자세히 설명드리겠습니다.\n\n"
+    yield "---\n\n" + "각 상향지원 안에 대해 자세히 설명드리겠습니다.\n\n"
 
     # 교과 전형 분석
-    report += "### 교과 전형 분석\n\n"
-    for i, (_, row) in enumerate(high_info[high_info['전형구분'] == '교과'].head(3).iterrows(), 1):
-        report += analyze_university(row, all_data, i, '교과')
+    yield "### 교과 전형 분석\n\n"
+    for i, ((_, row), stream, charts) in enumerate(zip(high_subject_info.iterrows(), subject_streams,
+                                                        subject_charts), 1):
+        yield from university_analysis_sections(row, i, '교과', stream, progress, charts)
 
     # 학생부 종합 전형 분석
-    report += "### 학생부 종합 전형 분석\n\n"
-    for i, (_, row) in enumerate(high_info[high_info['전형구분'] == '종합'].head(3).iterrows(), 1):
-        report += analyze_university(row, all_data, i, '학종')
-
-    tables = generate_detailed_tables(high_info, mid_info, low_info)
-
-    return report, tables
+    yield "### 학생부 종합 전형 분석\n\n"
+    for i, ((_, row), stream, charts) in enumerate(zip(high_comprehensive_info.iterrows(), comprehensive_streams,
+                                                        comprehensive_charts), 1):
+        yield from university_analysis_sections(row, i, '학종', stream, progress, charts)
 
 
 def generate_detailed_tables(high_info, mid_info, low_info):
@@ -427,6 +654,225 @@ def generate_detailed_tables(high_info, mid_info, low_info):
     return tables
 
 
+# 데이터 전처리 함수
+def preprocess_data(df):
+    df = df[df.columns.intersection(needed_columns)]
+    for col in needed_columns:
+        if col not in df.columns:
+            df[col] = np.nan
+    return df[needed_columns]
+
+
+def core_summaries(high_info, mid_info, low_info, additional_data):
+    """전형구분별 (대학명 - 전형명, 2025학년도 핵심정리) 목록."""
+    # 모든 필터링된 데이터를 합치고 중복 제거
+    all_filtered_data = pd.concat([high_info, mid_info, low_info], ignore_index=True)
+    unique_universities = all_filtered_data.drop_duplicates(subset=['대학명', '전형구분', '전형명'])
+
+    summaries = {}
+    for admission_type in ['교과', '종합']:
+        summaries[admission_type] = []
+        filtered_universities = unique_universities[unique_universities['전형구분'] == admission_type]
+        for _, row in filtered_universities.iterrows():
+            match = additional_data[(additional_data['대학명'] == row['대학명']) &
+                                    (additional_data['전형구분'] == row['전형구분']) &
+                                    (additional_data['전형명'] == row['전형명'])]
+            if not match.empty:
+                summaries[admission_type].append((f"{row['대학명']} - {row['전형명']}",
+                                                  match.iloc[0]['2025학년도_핵심정리']))
+    return summaries
+
+
+def selected_programs(final_selection, tier):
+    """교과/학종 두 전형에서 tier(상향/적정/하향)로 확정된 행을 보고서에 쓰는 열만 꺼내 합친다."""
+    return pd.concat([preprocess_data(materialize_rows(final_selection.get(f'{category}_{tier}', EMPTY_ROWS),
+                                                       needed_columns))
+                      for category in ('교과', '학종')],
+                     ignore_index=True)
+
+
+def run_report_job(final_selection, student_info, all_data, chart_mode, print_export, on_progress=None,
+                   on_section=None):
+    """보고서 한 건을 만들어 화면에 다시 그릴 수 있는 결과 dict로 반환한다. 작업 스레드에서 실행되며 st를 쓰지 않는다.
+
+    final_selection은 '교과_상향' 같은 키별 행 id 배열이며, 보고서에 쓰는 열만 여기서 꺼낸다.
+    on_section(위치, 구간)은 구간이 완성될 때마다, GPT 구간은 응답 조각이 도착하는 동안에도 불려
+    작업이 끝나기 전에 화면이 보고서를 앞에서부터 보여 줄 수 있게 한다.
+    """
+    def update_progress(fraction, name, elapsed, total_elapsed):
+        if on_progress is not None:
+            on_progress(fraction, name)
+
+    progress = ReportProgress(on_update=update_progress)
+
+    high_info = selected_programs(final_selection, '상향')
+    mid_info = selected_programs(final_selection, '적정')
+    low_info = selected_programs(final_selection, '하향')
+
+    # all_data도 전처리
+    all_data = preprocess_data(all_data)
+    progress.expect(1 + report_step_count(high_info))
+    progress.step("데이터 전처리")
+
+    # GPT 구간은 받는 동안 중간 마크다운을 내보내고, 응답을 모두 받으면 완성된 마크다운으로 바꿔 저장한다
+    additional_data = get_additional_data()
+    sections = []
+    for section in generate_report_sections(high_info, mid_info, low_info, student_info, all_data,
+                                            additional_data, progress, chart_mode):
+        position = len(sections)
+        if isinstance(section, GPTSection):
+            text = ""
+            last_publish = 0.0
+            for chunk in section.stream.chunks():
+                text += chunk
+                if on_section is not None and time.perf_counter() - last_publish >= JOB_SECTION_PUBLISH_INTERVAL:
+                    on_section(position, section.render(text) + "▌")
+                    last_publish = time.perf_counter()
+            section = section_markdown(section)
+        sections.append(section)
+        if on_section is not None:
+            on_section(position, section)
+
+    tables = generate_detailed_tables(high_info, mid_info, low_info)
+    progress.step("지원 가능안 상세 표")
+
+    return {
+        'sections': sections,
+        'tables': tables,
+        'print_report': print_report_markdown(sections) if print_export else None,
+        'core_summaries': core_summaries(high_info, mid_info, low_info, additional_data),
+        'stages': progress.stages,
+        'prompt_tokens': progress.prompt_tokens,
+        'total_elapsed': progress.total_elapsed,
+    }
+
+
+def render_report_result(result):
+    for section in result['sections']:
+        render_report_section(section)
+
+    if result['print_report'] is not None:
+        st.download_button("인쇄용 보고서 다운로드 (Markdown)", result['print_report'].encode('utf-8'),
+                           file_name="report.md", mime="text/markdown")
+    with st.expander(f"단계별 소요 시간 (총 {result['total_elapsed']:.1f}초)"):
+        st.table(pd.DataFrame(result['stages'], columns=['단계', '소요 시간(초)']))
+        if result['prompt_tokens']:
+            st.table(pd.DataFrame(result['prompt_tokens'], columns=['GPT 요청', '프롬프트 토큰(추정)']))
+            st.caption(f"프롬프트당 토큰 예산: {PROMPT_TOKEN_BUDGET}")
+        chart_stats = chart_cache.stats()
+        st.caption(f"차트 메모리 캐시: 적중 {chart_stats['hits']}회 / 미스 {chart_stats['misses']}회, "
+                   f"{chart_stats['entries']}건 {chart_stats['bytes'] / 1024:.0f}KB")
+        llm_stats = get_llm_client().stats()
+        st.caption(f"OpenAI 호출(프로세스 누적): {llm_stats['calls']}회, 실패 {llm_stats['failures']}회, "
+                   f"재시도 {llm_stats['retries']}회, 한도 대기 {llm_stats['throttle_wait']:.1f}초, "
+                   f"평균 {llm_stats['mean_latency']:.1f}초 / p95 {llm_stats['p95_latency']:.1f}초, "
+                   f"토큰 {llm_stats['prompt_tokens']} + {llm_stats['completion_tokens']}")
+        if LLM_CACHE_ENABLED:
+            cache_stats = get_llm_cache().stats()
+            st.caption(f"GPT 응답 캐시: 적중 {cache_stats['hits']}회 / 미스 {cache_stats['misses']}회 "
+                       f"(적중률 {cache_stats['hit_rate']:.0%}), {cache_stats['entries']}건 "
+                       f"{cache_stats['bytes'] / 1024:.0f}KB")
+
+    # 지원 가능안 상세 표 출력
+    st.markdown("---\n\n### 지원 가능안 상세 📋\n\n")
+    for table in result['tables']:
+        st.subheader(table['title'])
+        if table['data'] is not None:
+            # NaN 값을 '-'로 대체
+            display_data = table['data'].applymap(format_value)
+            st.dataframe(
+                display_data,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "구분": st.column_config.TextColumn("구분", width=50),
+                    "대학명": st.column_config.TextColumn("대학명", width=80),
+                    "전형구분": st.column_config.TextColumn("전형", width=60),
+                    "전형명": st.column_config.TextColumn("전형명", width=100),
+                    "모집단위": st.column_config.TextColumn("모집단위", width=100),
+                    "2025년_모집인원": st.column_config.TextColumn("모집", width=50),
+                    "2025년_최저요약": st.column_config.TextColumn("수능최저", width=80),
+                    "2024년_경쟁률": st.column_config.TextColumn("24경쟁", width=60),
+                    "2023년_경쟁률": st.column_config.TextColumn("23경쟁", width=60),
+                    "2024년_입결70%": st.column_config.TextColumn("입결70", width=60),
+                    "2024년_추가합격자수": st.column_config.TextColumn("추가", width=50),
+                },
+                height=400  # 테이블의 높이를 제한
+            )
+        else:
+            st.warning(f"{table['title']} 지원 데이터가 없거나 필요한 열이 존재하지 않습니다.")
+
+    # 대학별 2025학년도 핵심정리
+    st.markdown("---\n\n### 대학별 2025학년도 핵심정리 🎓\n\n")
+    for admission_type, summaries in result['core_summaries'].items():
+        st.subheader(f"{admission_type} 전형")
+        for title, core_summary in summaries:
+            st.markdown(f"**{title}**")
+            core_summary_html = core_summary.replace('\n', '<br>')
+            st.markdown(
+                f"<div style='background-color: rgba(0, 0, 0, 0.1); color: black; padding: 10px; border-radius: 5px;'>{core_summary_html}</div>",
+                unsafe_allow_html=True)
+            st.markdown("---")
+
+
+# 진행 중인 작업이 있는 동안 다시 읽는 주기(초). 첫 구간이 1초 안에 보이도록 짧게 둔다
+REPORT_JOB_POLL_INTERVAL = 0.5
+# 작업 스레드가 스트리밍 중인 GPT 구간을 작업 테이블에 쓰는 최소 간격(초)
+JOB_SECTION_PUBLISH_INTERVAL = 0.3
+JOB_STATUS_LABELS = {'queued': "대기 중", 'running': "작성 중", 'done': "완료", 'failed': "실패"}
+
+
+def report_job_owner():
+    # 로그인 사용자 단위로 작업을 모아 새로 고침 뒤에도 목록이 남게 한다
+    return st.session_state.get('username') or 'local'
+
+
+def render_partial_sections(runner, job_id):
+    """진행 중인 작업이 지금까지 내보낸 구간을 그린다. 바뀐 구간만 작업 테이블에서 다시 읽는다."""
+    partials = st.session_state.setdefault('report_job_partials', {})
+    cached = partials.setdefault(job_id, {})
+    versions = runner.section_versions(job_id)
+    cached.update(runner.sections(job_id, [position for position, version in versions.items()
+                                           if cached.get(position, (0, None))[0] != version]))
+    for position in sorted(cached):
+        render_report_section(cached[position][1])
+
+
+def render_report_jobs(jobs):
+    """작업 목록의 진행 중/실패 상태를 그린다."""
+    for job in jobs:
+        if job['status'] in ACTIVE_STATUSES:
+            stage = f" - {job['stage']} 완료" if job['stage'] else ""
+            st.progress(job['progress'], text=f"{job['label']}: {JOB_STATUS_LABELS[job['status']]}{stage}")
+        elif job['status'] == 'failed':
+            st.error(f"{job['label']}: 실패 ({job['error']})")
+
+
+@st.fragment(run_every=REPORT_JOB_POLL_INTERVAL)
+def show_active_report_jobs():
+    """대기/작성 중인 작업이 있을 때만 불리며 상태와 중간 결과를 주기적으로 다시 그린다.
+
+    작업이 하나라도 끝나면(진행 중인 작업이 없어지는 경우 포함) 앱 전체를 다시 실행해 완성된 보고서를 보여 주고,
+    진행 중인 작업이 없으면 다음 실행에서는 이 프래그먼트를 부르지 않으므로 주기적 조회도 멈춘다.
+    """
+    jobs = get_report_job_runner().jobs(report_job_owner())
+    render_report_jobs(jobs)
+
+    # 방금 요청한 보고서가 작성 중이면 완성된 구간부터 보여 준다
+    selected = st.session_state.get('selected_report_job')
+    active = {job['id'] for job in jobs if job['status'] in ACTIVE_STATUSES}
+    for job_id in set(st.session_state.get('report_job_partials', {})) - active:
+        del st.session_state['report_job_partials'][job_id]
+    if selected in active:
+        render_partial_sections(get_report_job_runner(), selected)
+
+    previous = st.session_state.get('active_report_jobs', set())
+    st.session_state['active_report_jobs'] = active
+    if previous - active or not active:
+        st.rerun()
+
+
+@tab_fragment('보고서 작성')
 def show_report_generation():
     st.info("최종 필터링된 데이터로 보고서를 작성합니다.")
 
@@ -438,100 +884,40 @@ def show_report_generation():
     student_info = st.session_state['student_info']
     all_data = st.session_state.get('all_data', pd.DataFrame())
 
-    # 데이터 전처리 함수
-    def preprocess_data(df):
-        df = df[df.columns.intersection(needed_columns)]
-        for col in needed_columns:
-            if col not in df.columns:
-                df[col] = np.nan
-        return df[needed_columns]
+    chart_modes = ['screen', 'svg']
+    chart_mode = st.selectbox("차트 형식", chart_modes,
+                              index=chart_modes.index(CHART_OUTPUT_MODE) if CHART_OUTPUT_MODE in chart_modes else 0,
+                              format_func={'screen': "화면용 PNG", 'svg': "SVG (인라인, 가벼움)"}.get)
+    print_export = st.checkbox("인쇄용 보고서 파일(300dpi 차트) 함께 만들기")
 
+    # 보고서는 백그라운드 작업으로 만들고, 이 화면은 상태만 확인하므로 여러 건을 동시에 돌릴 수 있다
+    runner = get_report_job_runner()
     if st.button("보고서 생성"):
-        with st.spinner("보고서 작성 중입니다..."):
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(1)  # 0.01초마다 진행 상황 업데이트
-                progress_bar.progress(i + 1)
-
-            high_info = pd.concat([preprocess_data(final_selection.get('교과_상향', pd.DataFrame())),
-                                   preprocess_data(final_selection.get('학종_상향', pd.DataFrame()))],
-                                  ignore_index=True)
-            mid_info = pd.concat([preprocess_data(final_selection.get('교과_적정', pd.DataFrame())),
-                                  preprocess_data(final_selection.get('학종_적정', pd.DataFrame()))],
-                                 ignore_index=True)
-            low_info = pd.concat([preprocess_data(final_selection.get('교과_하향', pd.DataFrame())),
-                                  preprocess_data(final_selection.get('학종_하향', pd.DataFrame()))],
-                                 ignore_index=True)
-
-            # all_data도 전처리
-            all_data = preprocess_data(all_data)
-
-            additional_data = st.session_state['additional_data']
-            report, tables = generate_report(high_info, mid_info, low_info, student_info, all_data, additional_data)
-
+        label = f"{time.strftime('%H:%M:%S')} {student_info['school_type']} 내신 {student_info['score']}"
+        job_id = runner.submit(report_job_owner(), label, run_report_job, final_selection, student_info, all_data,
+                               chart_mode, print_export)
+        st.session_state['selected_report_job'] = job_id
+        st.toast("보고서 작성을 시작했습니다. 다른 탭으로 이동하거나 다른 보고서를 만들어도 됩니다.")
+
+    # 진행 중인 작업이 있을 때만 주기적으로 조회하고, 없으면 목록을 한 번만 그린다
+    jobs = runner.jobs(report_job_owner())
+    if any(job['status'] in ACTIVE_STATUSES for job in jobs):
+        show_active_report_jobs()
+    else:
+        render_report_jobs(jobs)
+
+    finished_jobs = [job for job in jobs if job['status'] == 'done']
+    if not finished_jobs:
+        return
+    job_ids = [job['id'] for job in finished_jobs]
+    labels = {job['id']: job['label'] for job in finished_jobs}
+    selected = st.session_state.get('selected_report_job')
+    job_id = st.selectbox("완성된 보고서", job_ids, format_func=labels.get,
+                          index=job_ids.index(selected) if selected in job_ids else 0)
+    result = runner.result(job_id)
+    if result is not None:
         st.success("보고서 생성이 완료되었습니다!")
-        st.markdown(report, unsafe_allow_html=True)
-
-        # 지원 가능안 상세 표 출력
-        st.markdown("---\n\n### 지원 가능안 상세 📋\n\n")
-        for table in tables:
-            st.subheader(table['title'])
-            if table['data'] is not None:
-                # NaN 값을 '-'로 대체
-                display_data = table['data'].applymap(format_value)
-                st.dataframe(
-                    display_data,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "구분": st.column_config.TextColumn("구분", width=50),
-                        "대학명": st.column_config.TextColumn("대학명", width=80),
-                        "전형구분": st.column_config.TextColumn("전형", width=60),
-                        "전형명": st.column_config.TextColumn("전형명", width=100),
-                        "모집단위": st.column_config.TextColumn("모집단위", width=100),
-                        "2025년_모집인원": st.column_config.TextColumn("모집", width=50),
-                        "2025년_최저요약": st.column_config.TextColumn("수능최저", width=80),
-                        "2024년_경쟁률": st.column_config.TextColumn("24경쟁", width=60),
-                        "2023년_경쟁률": st.column_config.TextColumn("23경쟁", width=60),
-                        "2024년_입결70%": st.column_config.TextColumn("입결70", width=60),
-                        "2024년_추가합격자수": st.column_config.TextColumn("추가", width=50),
-                    },
-                    height=400  # 테이블의 높이를 제한
-                )
-            else:
-                st.warning(f"{table['title']} 지원 데이터가 없거나 필요한 열이 존재하지 않습니다.")
-
-        # 대학별 2025학년도 핵심정리
-        st.markdown("---\n\n### 대학별 2025학년도 핵심정리 🎓\n\n")
-
-        # 모든 필터링된 데이터를 합치기
-        all_filtered_data = pd.concat([high_info, mid_info, low_info], ignore_index=True)
-
-        # 중복 제거
-        unique_universities = all_filtered_data.drop_duplicates(subset=['대학명', '전형구분', '전형명'])
-
-        # 추가 데이터와 매칭하여 핵심정리 출력
-        additional_data = st.session_state['additional_data']
-
-        for admission_type in ['교과', '종합']:
-            st.subheader(f"{admission_type} 전형")
-            filtered_universities = unique_universities[unique_universities['전형구분'] == admission_type]
-
-            for _, row in filtered_universities.iterrows():
-                match = additional_data[(additional_data['대학명'] == row['대학명']) &
-                                        (additional_data['전형구분'] == row['전형구분']) &
-                                        (additional_data['전형명'] == row['전형명'])]
-                if not match.empty:
-                    st.markdown(f"**{row['대학명']} - {row['전형명']}**")
-
-                    core_summary = match.iloc[0]['2025학년도_핵심정리']
-                    core_summary_html = core_summary.replace('\n', '<br>')
-
-                    st.markdown(
-                        f"<div style='background-color: rgba(0, 0, 0, 0.1); color: black; padding: 10px; border-radius: 5px;'>{core_summary_html}</div>",
-                        unsafe_allow_html=True)
-
-                    st.markdown("---")
+        render_report_result(result)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 import streamlit as st
-import pandas as pd
-from data_loader import data
-from filters import filter_data, apply_filters
-from ui_components import create_option_filters, display_university_checklist, display_university_data
-from category_mapping import DETAIL_TO_MID_CATEGORY, MID_TO_MAIN_CATEGORY
+from filters import TIERS, cached_first_filter_rows, first_filter_cache
+from filter_pipeline import FilterPipeline
+from tab_runtime import invalidate_on_change, publish, show_notice, tab_fragment
+from row_selection import EMPTY_ROWS, as_row_ids, materialize_rows, rows_in_universities
+from ui_components import create_option_filters, display_selection_grid, display_university_checklist, \
+    reset_selection_grid
 
 def create_filter_box(title, content):
     st.markdown(f"""
@@ -36,29 +37,17 @@ def add_search_range_selector(prefix):
     return search_range
 
 
-def filter_by_search_range(df, student_info, search_range):
-    if df.empty:
-        return df
-
-    if search_range == "대계열 검색":
-        return df[df['계열'].isin(student_info['field'])]
-
-    elif search_range == "중계열 검색":
-        mid_categories = list(set([DETAIL_TO_MID_CATEGORY.get(field, "") for field in student_info['detail_fields']]))
-        return df[df['계열구분'].isin(mid_categories)]
-
-    elif search_range == "소계열 검색":
-        return df[df['계열상세명'].apply(
-            lambda x: any(field.lower() in str(x).lower() for field in student_info['detail_fields']))]
-
-    return df
-
+@tab_fragment('교과 필터링')
 def show_subject_filtering():
     if 'student_info' not in st.session_state:
         st.warning("정보입력 탭에서 먼저 정보를 입력하세요.")
         return
 
     student_info = st.session_state['student_info']
+    # 저장된 결과도 이전 학생 정보로 고른 것이므로 함께 지운다
+    if invalidate_on_change('subject_filtering', ['student_info'],
+                            ['subject_first_filter_results', 'subject_second_filter_results', 'saved_subject_results']):
+        st.info("학생 정보가 바뀌어 이전 필터링 결과와 저장된 결과를 지웠습니다. 1차 필터링부터 다시 진행하세요.")
 
     st.info("교과 전형 필터링을 위한 조건을 설정해보세요.")
 
@@ -80,36 +69,30 @@ def show_subject_filtering():
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("1차 필터링", key="subject_first_filter_button"):
-            high_list, mid_list, low_list = filter_data(student_info, data)
-
-            high_list = filter_by_search_range(high_list, student_info, search_range)
-            mid_list = filter_by_search_range(mid_list, student_info, search_range)
-            low_list = filter_by_search_range(low_list, student_info, search_range)
-
-            high_list = apply_filters(high_list, filters, student_info, '상향')
-            mid_list = apply_filters(mid_list, filters, student_info, '적정')
-            low_list = apply_filters(low_list, filters, student_info, '하향')
-
-            if lowest_ability_filter:
-                high_list = high_list[high_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-                mid_list = mid_list[mid_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-                low_list = low_list[low_list['2025년_수능최저코드'] <= student_info['lowest_ability_code']]
-
+            if 'subject_filter_pipeline' not in st.session_state:
+                st.session_state['subject_filter_pipeline'] = FilterPipeline('교과')
+            pipeline = st.session_state['subject_filter_pipeline']
+            pipeline.recomputed = []
+            rows = cached_first_filter_rows(student_info, '교과', filters, search_range, pipeline)
+            # 세션에는 마스터 테이블의 행 id만 저장한다
             st.session_state['subject_first_filter_results'] = {
-                'high_list': high_list if not high_list.empty else pd.DataFrame(),
-                'mid_list': mid_list if not mid_list.empty else pd.DataFrame(),
-                'low_list': low_list if not low_list.empty else pd.DataFrame()
+                list_type: as_row_ids(rows[tier]) for list_type, tier in zip(['high_list', 'mid_list', 'low_list'], TIERS)
             }
             st.success("1차 필터링이 완료되었습니다.")
+            cache_stats = first_filter_cache.stats()
+            st.caption(f"1차 필터링 캐시 적중 {cache_stats['hits']}회 / 미스 {cache_stats['misses']}회 "
+                       f"({cache_stats['bytes'] / 1024:.0f} KB)")
+            if pipeline.recomputed:
+                st.caption(f"재계산된 단계 {len(pipeline.recomputed)}개, {pipeline.elapsed_ms:.1f} ms")
 
     if 'subject_first_filter_results' in st.session_state:  # comprehensive_filtering.py에서는 'comprehensive_first_filter_results'
         st.markdown("---")
         st.markdown("&nbsp;")
         st.subheader("1️⃣ 1차 필터링 결과")
         for list_type, list_name in [('high_list', '상향'), ('mid_list', '적정'), ('low_list', '하향')]:
-            df = st.session_state['subject_first_filter_results'][
-                list_type]  # comprehensive_filtering.py에서는 'comprehensive_first_filter_results'
-            if not df.empty and '대학명' in df.columns:
+            rows = st.session_state['subject_first_filter_results'][list_type]
+            if len(rows):
+                df = materialize_rows(rows, ['대학명'])
                 selected = display_university_checklist(df, f"{list_name} 리스트",
                                                         prefix="subject_")  # comprehensive_filtering.py에서는 prefix="comprehensive_"
                 st.session_state[
@@ -121,11 +104,11 @@ def show_subject_filtering():
             if st.button("2차 필터링", key="subject_second_filter_button"):
                 st.session_state['subject_second_filter_results'] = {}
                 for list_type in ['high_list', 'mid_list', 'low_list']:
-                    df = st.session_state['subject_first_filter_results'].get(list_type, pd.DataFrame())
+                    rows = st.session_state['subject_first_filter_results'].get(list_type, EMPTY_ROWS)
                     selected = st.session_state.get(f'subject_{list_type}_selected', [])
-                    if not df.empty and '대학명' in df.columns:
-                        filtered_df = df[df['대학명'].isin(selected)]
-                        st.session_state['subject_second_filter_results'][list_type] = filtered_df
+                    st.session_state['subject_second_filter_results'][list_type] = rows_in_universities(rows, selected)
+                    reset_selection_grid(f'subject_displayed_{list_type}',
+                                         st.session_state['subject_second_filter_results'][list_type])
                 st.success("2차 필터링이 완료되었습니다.")
 
     if 'subject_second_filter_results' in st.session_state:
@@ -136,60 +119,24 @@ def show_subject_filtering():
                 [('high_list', '상향', '⬆️'), ('mid_list', '적정', '➖'), ('low_list', '하향', '⬇️')]):
             if index > 0:
                 st.markdown("<hr style='border-top: 3px dashed #bbb;'>", unsafe_allow_html=True)  # 파선 추가
-            df = st.session_state['subject_second_filter_results'].get(list_type, pd.DataFrame())
-            if not df.empty:
+            rows = st.session_state['subject_second_filter_results'].get(list_type, EMPTY_ROWS)
+            if len(rows):
                 st.write(f"**{emoji} {list_name} 리스트**")
-                if '대학명' in df.columns:
-                    for univ in df['대학명'].unique():
-                        st.write(f"**{univ}**")
-                        group = df[df['대학명'] == univ]
-
-                        # 선택 컬럼을 추가하고 기본값을 True로 설정
-                        group['선택'] = True
-
-                        # 선택 컬럼을 맨 앞으로 이동
-                        cols = ['선택'] + [col for col in group.columns if col != '선택']
-                        group = group[cols]
-
-                        edited_df = st.data_editor(
-                            group,
-                            hide_index=True,
-                            column_config={
-                                "선택": st.column_config.CheckboxColumn(
-                                    "선택",
-                                    help="이 행을 선택하려면 체크하세요"
-                                )
-                            },
-                            disabled=group.columns.drop('선택'),
-                            key=f"editor_subject_{list_type}_{univ}"
-                        )
-                        st.session_state[f'subject_displayed_{list_type}_{univ}'] = edited_df[edited_df['선택']]
-                else:
-                    st.warning(f"'{list_name}' 리스트에 '대학명' 열이 없습니다.")
+                display_selection_grid(rows, key=f'subject_displayed_{list_type}')
             else:
                 st.warning(f"{emoji} {list_name} 리스트에 데이터가 없습니다.")
 
     with col3:
         if st.button("결과 저장", key="save_subject_results_button"):
             saved_results = {
-                'high_list': pd.DataFrame(),
-                'mid_list': pd.DataFrame(),
-                'low_list': pd.DataFrame()
+                list_type: st.session_state.get(f'subject_displayed_{list_type}', EMPTY_ROWS)
+                for list_type in ['high_list', 'mid_list', 'low_list']
             }
-            for list_type in ['high_list', 'mid_list', 'low_list']:
-                df = st.session_state['subject_second_filter_results'].get(list_type, pd.DataFrame())
-                if not df.empty and '대학명' in df.columns:
-                    for univ in df['대학명'].unique():
-                        if f'subject_displayed_{list_type}_{univ}' in st.session_state:
-                            saved_results[list_type] = pd.concat([saved_results[list_type],
-                                                                  st.session_state[
-                                                                      f'subject_displayed_{list_type}_{univ}']])
-                elif not df.empty:
-                    st.warning(f"'{list_type}' 리스트에 '대학명' 열이 없습니다.")
 
             st.session_state['saved_subject_results'] = saved_results
-            total_count = sum(len(df) for df in saved_results.values())
-            st.success(f"결과가 저장되었습니다. 총 {total_count}개의 학과가 저장되었습니다.")
+            total_count = sum(len(rows) for rows in saved_results.values())
+            publish('saved_subject_results', f"결과가 저장되었습니다. 총 {total_count}개의 학과가 저장되었습니다.")
+        show_notice('saved_subject_results')
 
 if __name__ == "__main__":
     show_subject_filtering()
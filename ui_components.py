@@ -1,5 +1,13 @@
+import math
+
+import numpy as np
 import streamlit as st
 import pandas as pd
+from row_selection import EMPTY_ROWS, as_row_ids, concat_row_ids, materialize_rows, university_names
+from session_metrics import session_state_report, session_state_sizes
+from prewarm import prewarm_timings
+from tab_runtime import TAB_FRAGMENTS, tab_timing_report
+from university_ranking import RANKING_BANDS, UNRANKED_BAND, universities_in_band, university_rank
 
 def create_option_filters(prefix=""):
     filters = {'상향': {}, '적정': {}, '하향': {}}
@@ -60,7 +68,22 @@ def create_option_filters(prefix=""):
     return filters
 
 
+def _set_university_selection(key, universities):
+    st.session_state[key] = list(universities)
+
+
+def _add_ranking_band(key, universities):
+    band = st.session_state[f"{key}_band"]
+    chosen = set(st.session_state.get(key, [])) | set(universities_in_band(universities, band))
+    st.session_state[key] = [univ for univ in universities if univ in chosen]
+
+
 def display_university_checklist(df, title, prefix=""):
+    """대학명 multiselect 하나(입력하는 대로 검색)와 전체 선택/해제, 순위 구간 추가 버튼으로 대학을 고른다.
+
+    대학 수와 관계없이 위젯 수가 일정하고, 선택은 대학명 목록으로 f"{prefix}{title}_universities" 키에 남으므로
+    1차 필터링을 다시 해도 목록에 남아 있는 대학의 선택은 유지된다.
+    """
     st.subheader(title)
     if df.empty:
         st.warning(f"{title}에 데이터가 없습니다.")
@@ -70,13 +93,26 @@ def display_university_checklist(df, title, prefix=""):
         st.error(f"{title}의 데이터에 '대학명' 열이 없습니다.")
         return []
 
-    universities = sorted(df['대학명'].unique())
-    selected_universities = []
-    cols = st.columns(3)
-    for i, univ in enumerate(universities):
-        with cols[i % 3]:
-            if st.checkbox(univ, key=f"{prefix}{title}_{univ}_{i}"):
-                selected_universities.append(univ)
+    universities = sorted(df['대학명'].unique(), key=lambda univ: (university_rank(univ), univ))
+    key = f"{prefix}{title}_universities"
+    # 목록에서 빠진 대학이 남아 있으면 multiselect가 오류를 내므로 위젯을 만들기 전에 걸러 둔다
+    if key in st.session_state:
+        available = set(universities)
+        st.session_state[key] = [univ for univ in st.session_state[key] if univ in available]
+
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        st.selectbox("순위 구간", list(RANKING_BANDS) + [UNRANKED_BAND], key=f"{key}_band",
+                     label_visibility="collapsed")
+    with col2:
+        st.button("구간 추가", key=f"{key}_add_band", on_click=_add_ranking_band, args=(key, universities))
+    with col3:
+        st.button("전체 선택", key=f"{key}_select_all", on_click=_set_university_selection, args=(key, universities))
+    with col4:
+        st.button("전체 해제", key=f"{key}_clear", on_click=_set_university_selection, args=(key, []))
+
+    selected_universities = st.multiselect(f"대학 {len(universities)}곳 (입력해서 검색)", universities, key=key,
+                                           placeholder="대학명을 입력하세요")
     return selected_universities
 
 def display_university_data(df, title):
@@ -100,4 +136,100 @@ def display_university_data(df, title):
         disabled=df.columns.drop('선택'),
         key=f"editor_{title.replace(' ', '_')}"
     )
-    return edited_df[edited_df['선택']]
\ No newline at end of file
+    return edited_df[edited_df['선택']]
+
+# 2차 필터링 표에서 학과를 고를 때 보는 열
+GRID_COLUMNS = [
+    '대학명', '전형명', '모집단위', '계열상세명', '2025년_모집인원', '2024년_경쟁률', '3개년_경쟁률_평균',
+    '2024년_입결70%', '3개년_입결70%_평균', '2024년_충원율(%)', '2025년_최저요약',
+]
+GRID_PAGE_SIZE = 50
+
+
+def reset_selection_grid(key, rows):
+    """표의 선택을 rows 전체로 되돌린다. 편집기 키가 바뀌므로 이전 편집 내용은 버려진다."""
+    st.session_state[key] = as_row_ids(rows)
+    st.session_state[f"{key}_version"] = st.session_state.get(f"{key}_version", 0) + 1
+
+
+def display_selection_grid(rows, key, page_size=GRID_PAGE_SIZE):
+    """행 id 배열을 대학명으로 묶은 표 하나로 보여 주고, 선택된 행 id를 표 순서대로 반환한다.
+
+    한 번에 한 페이지(page_size 행)의 GRID_COLUMNS만 DataFrame으로 만들므로 대학 수와 관계없이 재실행 비용이
+    일정하다. 선택은 st.session_state[key]에 행 id 배열로 두며 처음에는 모두 선택되어 있다.
+    """
+    rows = as_row_ids(rows)
+    names = university_names(rows)
+    order = np.argsort(names, kind='stable')
+    rows, names = rows[order], names[order]
+    if key not in st.session_state:
+        st.session_state[key] = rows
+    universities = list(pd.unique(names))
+
+    col1, col2, col3 = st.columns([4, 1, 1])
+    with col1:
+        university = st.selectbox("대학 찾기", ['(전체)'] + universities, key=f"{key}_university")
+    with col2:
+        if st.button("전체 선택", key=f"{key}_select_all"):
+            reset_selection_grid(key, rows)
+    with col3:
+        if st.button("전체 해제", key=f"{key}_clear"):
+            reset_selection_grid(key, EMPTY_ROWS)
+    selected = st.session_state[key]
+    version = st.session_state.get(f"{key}_version", 0)
+
+    view = rows if university == '(전체)' else rows[names == university]
+    page_count = max(1, math.ceil(len(view) / page_size))
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"페이지 (총 {page_count}쪽)", 1, page_count, 1, key=f"{key}_page_{university}")
+    page_rows = view[(page - 1) * page_size:page * page_size]
+
+    df = materialize_rows(page_rows, GRID_COLUMNS)
+    df.insert(0, '선택', np.isin(page_rows, selected))
+    edited_df = st.data_editor(
+        df,
+        hide_index=True,
+        column_config={
+            "선택": st.column_config.CheckboxColumn(
+                "선택",
+                help="이 행을 선택하려면 체크하세요"
+            )
+        },
+        disabled=df.columns.drop('선택'),
+        key=f"{key}_editor_{version}_{university}_{page}"
+    )
+
+    # 이 페이지의 선택만 편집 결과로 바꾸고, 다른 페이지의 선택은 그대로 둔다
+    checked = as_row_ids(edited_df.index[edited_df['선택']])
+    selected = concat_row_ids([selected[~np.isin(selected, page_rows)], checked])
+    selected = rows[np.isin(rows, selected)]
+    st.session_state[key] = selected
+    st.caption(f"대학 {len(universities)}곳, 학과 {len(rows)}개 중 {len(selected)}개 선택")
+    return selected
+
+
+def display_session_state_usage(top=10):
+    """이 세션의 session_state 키별 크기와 서버의 세션별 총 크기를 보여 준다."""
+    with st.expander("세션 메모리 사용량"):
+        sizes = session_state_sizes(st.session_state)
+        st.caption(f"이 세션: {sum(size for _, size in sizes) / 1024:.1f} KB")
+        st.dataframe(pd.DataFrame([(key, size / 1024) for key, size in sizes[:top]], columns=['키', 'KB']),
+                     hide_index=True, use_container_width=True)
+        sessions = session_state_report()
+        st.caption(f"최근 활성 세션 {len(sessions)}개")
+        st.dataframe(pd.DataFrame([(session_id[:8], owner, size / 1024) for session_id, owner, size, _ in sessions],
+                                  columns=['세션', '사용자', 'KB']),
+                     hide_index=True, use_container_width=True)
+
+
+def display_tab_timings():
+    """탭별 최근 실행 시간. TAB_FRAGMENTS=0으로 띄운 앱과 비교하면 프래그먼트 전후의 조작당 지연을 볼 수 있다."""
+    with st.expander("탭 실행 시간"):
+        st.caption("탭별 프래그먼트 실행" if TAB_FRAGMENTS else "매번 모든 탭 실행 (TAB_FRAGMENTS=0)")
+        st.dataframe(pd.DataFrame(tab_timing_report(), columns=['탭', '실행 횟수', '마지막 ms', '평균 ms', 'p95 ms']),
+                     hide_index=True, use_container_width=True)
+        if prewarm_timings:
+            st.caption("서버 시작 pre-warm: " + ", ".join(
+                f"{name} {elapsed:.1f}s" + (" (실패)" if error else "")
+                for name, (elapsed, error) in prewarm_timings.items()))
@@ -0,0 +1,31 @@
+# university_ranking.py
+# 보고서 정렬과 대학 체크리스트의 구간 선택이 함께 쓰는 대학 순위표
+
+UNIVERSITY_RANKING = [
+    '서울대학교', '연세대학교', '고려대학교', 'KAIST', 'POSTECH', '서강대학교', '성균관대학교', '한양대학교', '중앙대학교', '경희대학교', '한국외국어대학교',
+    '서울시립대학교', '건국대학교', '동국대학교', '홍익대학교', '국민대학교', '숭실대학교', '세종대학교', '단국대학교', 'DGIST', 'UNIST', 'GIST',
+    '이화여자대학교', '성신여자대학교', '숙명여자대학교', '광운대학교', '명지대학교', '상명대학교', '가천대학교', '가톨릭대학교',
+]
+UNIVERSITY_RANK = {name: rank for rank, name in enumerate(UNIVERSITY_RANKING)}
+
+# 구간 이름: UNIVERSITY_RANKING에서의 [시작, 끝) 위치. 순위표에 없는 대학은 '순위 외'다
+RANKING_BANDS = {
+    '1~5위': (0, 5),
+    '6~11위': (5, 11),
+    '12~22위': (11, 22),
+    '23~30위': (22, 30),
+}
+UNRANKED_BAND = '순위 외'
+
+
+def university_rank(name):
+    """순위표 위치(0부터). 순위표에 없으면 len(UNIVERSITY_RANKING)."""
+    return UNIVERSITY_RANK.get(name, len(UNIVERSITY_RANKING))
+
+
+def universities_in_band(universities, band):
+    """universities 중 band 구간에 속하는 대학명 목록 (입력 순서 유지)."""
+    if band == UNRANKED_BAND:
+        return [name for name in universities if name not in UNIVERSITY_RANK]
+    start, end = RANKING_BANDS[band]
+    return [name for name in universities if start <= university_rank(name) < end]